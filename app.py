@@ -5,18 +5,26 @@ Track: MCP in Action (Creative)
 Team: kaiser-data
 """
 
+import itertools
+import json
 import os
+import re
 import tempfile
+import threading
 import gradio as gr
 from dotenv import load_dotenv
+from fastapi import Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
-from src.personas import PERSONAS, get_persona_names, get_persona
-from src.agent import run_agent
-from src.tts import generate_speech
-
-# Load environment variables
+# Load environment variables before importing src: its modules read settings at import time
 load_dotenv()
 
+from src import profiling, usage
+from src.personas import PERSONAS, UnknownPersonaError, get_persona, get_persona_labels
+from src.agent import MCP_TOOLS, run_agent, run_agent_multi
+from src.deadline import Deadline, DeadlineExceeded, DEFAULT_EXPLAIN_BUDGET, DEFAULT_AUDIO_BUDGET
+from src.tts import AUDIO_PRESETS, audio_suffix, generate_speech, resolve_audio_preset
+
 
 # Custom CSS for better styling
 CUSTOM_CSS = """
@@ -89,93 +97,309 @@ def format_sources(sources: list[dict]) -> str:
     return md
 
 
+MCP_TOOLS_HEADER = "| Tool | Description |\n|------|-------------|\n"
+MCP_TOOLS_BY_NAME = {tool["name"]: tool for tool in MCP_TOOLS}
+TRACE_SEPARATOR = "\n\n---\n\n"
+
+# /events/explain runs outside the Gradio queue, so it has its own cap
+MAX_EVENT_STREAMS = int(os.getenv("EXPLAINOR_MAX_EVENT_STREAMS", "4"))
+EVENT_STREAM_SLOTS = threading.BoundedSemaphore(MAX_EVENT_STREAMS)
+
+
+def format_tool_row(tool: dict) -> str:
+    """Format one tool as a markdown table row."""
+    return f"| {tool['icon']} `{tool['name']}` | {tool['desc']} |\n"
+
+
 def format_mcp_tools(tools: list[dict]) -> str:
     """Format tools used as markdown table."""
     if not tools:
         return "*Waiting for explanation...*"
 
-    md = "| Tool | Description |\n|------|-------------|\n"
-    for tool in tools:
-        md += f"| {tool['icon']} `{tool['name']}` | {tool['desc']} |\n"
-    return md
+    return MCP_TOOLS_HEADER + "".join(format_tool_row(tool) for tool in tools)
+
+
+def format_step(update: dict) -> str:
+    """Format one agent step for the trace."""
+    return f"**{update['title']}**\n{update['content']}"
 
 
 def explain_topic(topic: str, persona_name: str, audience: str = "", progress=gr.Progress()):
-    """Main function to explain a topic in a persona's voice."""
+    """Main function to explain a topic in a persona's voice.
+
+    Streams (explanation, sources_md, steps_md, mcp_md) as run_agent()
+    progresses. The trace and tools table only ever grow by appending, so
+    Gradio's generator diffing sends just the new step or row; outputs that
+    did not change are skipped until the final update.
+    """
     if not topic.strip():
-        return "Please enter a topic to explain!", "", "", ""
+        yield "Please enter a topic to explain!", "", "", ""
+        return
 
     if not persona_name:
-        persona_name = "5-Year-Old"
+        persona_name = PERSONAS.default.name
 
-    steps_log = []
-    explanation = ""
-    sources = []
-    mcp_tools = []
+    try:
+        get_persona(persona_name)
+    except UnknownPersonaError as e:
+        raise gr.Error(str(e))
+
+    steps_md = ""
+    sources_md = format_sources([])
+    mcp_md = ""
 
     progress(0, desc="Starting...")
 
-    for update in run_agent(topic, persona_name, audience):
-        if update["type"] == "step":
-            step_text = f"**{update['title']}**\n{update['content']}"
-            steps_log.append(step_text)
+    # One deadline for the whole request, shared by research and LLM
+    deadline = Deadline(DEFAULT_EXPLAIN_BUDGET)
 
-            if update["step"] == "research":
-                progress(0.2, desc="🔍 Researching...")
-            elif update["step"] == "research_done":
-                progress(0.4, desc="📚 Research complete")
-                if "sources" in update:
-                    sources = update["sources"]
-            elif update["step"] == "generating":
-                progress(0.6, desc="🎭 Generating explanation...")
+    try:
+        for update in run_agent(topic, persona_name, audience, deadline=deadline):
+            explanation_out = sources_out = mcp_out = gr.skip()
+
+            if update["type"] == "step":
+                if steps_md:
+                    steps_md += TRACE_SEPARATOR
+                steps_md += format_step(update)
+
+                if update.get("tool"):
+                    mcp_md = (mcp_md or MCP_TOOLS_HEADER) + format_tool_row(MCP_TOOLS_BY_NAME[update["tool"]])
+                    mcp_out = mcp_md
+
+                if update["step"] == "research":
+                    progress(0.2, desc="🔍 Researching...")
+                elif update["step"] == "research_done":
+                    progress(0.4, desc="📚 Research complete")
+                    if "sources" in update:
+                        sources_md = sources_out = format_sources(update["sources"])
+                elif update["step"] == "generating":
+                    progress(0.6, desc="🎭 Generating explanation...")
+
+                yield explanation_out, sources_out, steps_md, mcp_out
+
+            elif update["type"] == "result":
+                progress(1.0, desc="✅ Done!")
+                # Full values on the last update so API/MCP callers get every output;
+                # for the UI these diff to nothing but the explanation
+                yield update["explanation"], sources_md, steps_md, format_mcp_tools(update["mcp_tools"])
+    except DeadlineExceeded:
+        progress(1.0, desc="⏱️ Timed out")
+        raise gr.Error(f"Explanation took longer than {deadline.budget:.0f}s. Please try again!")
+
+
+def explain_events(topic: str, persona: str, audience: str = ""):
+    """Server-sent events feed of the agent's structured steps and result.
+
+    GET /events/explain?topic=...&persona=...&audience=... - one SSE event per
+    run_agent() update ("step", "result" or "error"), each carrying only that
+    update as JSON. At most MAX_EVENT_STREAMS run at once; beyond that the
+    feed is a single "error" event.
+    """
+    def stream():
+        if not EVENT_STREAM_SLOTS.acquire(blocking=False):
+            busy = {"type": "error", "error": "Too many live explain streams, try again shortly"}
+            yield f"event: error\ndata: {json.dumps(busy)}\n\n"
+            return
+        try:
+            updates = usage.track_generator(
+                run_agent(topic, persona, audience, deadline=Deadline(DEFAULT_EXPLAIN_BUDGET)),
+                "explain",
+                persona=persona_key(persona),
+                audience=audience,
+                client="sse",
+            )
+            for update in updates:
+                yield f"event: {update['type']}\ndata: {json.dumps(update)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+        finally:
+            EVENT_STREAM_SLOTS.release()
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+def save_audio(audio_bytes: bytes, output_format: str, name: str = "") -> str:
+    """Write audio bytes to a temp file Gradio can serve and return its path.
+
+    The suffix follows the output format, so Gradio serves it with the right type.
+    With a name (e.g. the persona) the file is called "<name><suffix>", so
+    clips listed side by side can be told apart.
+    """
+    suffix = audio_suffix(output_format)
+    if name:
+        path = os.path.join(tempfile.mkdtemp(), re.sub(r"[^\w-]+", "-", name).strip("-") + suffix)
+        with open(path, "wb") as f:
+            f.write(audio_bytes)
+        return path
+
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+        f.write(audio_bytes)
+        return f.name
 
-        elif update["type"] == "result":
-            explanation = update["explanation"]
-            sources = update.get("sources", sources)
-            mcp_tools = update.get("mcp_tools", [])
-            progress(1.0, desc="✅ Done!")
 
-    steps_md = "\n\n---\n\n".join(steps_log)
-    sources_md = format_sources(sources)
-    mcp_md = format_mcp_tools(mcp_tools)
+def format_comparison(results: list[dict]) -> str:
+    """Format per-persona explanations (in completion order) as markdown."""
+    if not results:
+        return "*Waiting for explanations...*"
 
-    return explanation, sources_md, steps_md, mcp_md
+    md = ""
+    for result in results:
+        if result["type"] == "error":
+            md += f"### ❌ {result['persona']}\n\n*{result['error']}*\n\n"
+        else:
+            md += f"### {result['persona_emoji']} {result['persona']}\n\n{result['explanation']}\n\n"
+    return md
 
 
-def generate_audio(explanation: str, persona_name: str, progress=gr.Progress()):
-    """Generate audio from the explanation text."""
+def compare_topic(
+    topic: str,
+    persona_names: list[str],
+    audience: str = "",
+    with_audio: bool = False,
+    audio_quality: str = "",
+):
+    """Explain a topic in several persona voices, streaming each as it finishes.
+
+    Yields (explanations_md, sources_md, audio_paths).
+    """
+    if not topic.strip():
+        yield "Please enter a topic to explain!", "", []
+        return
+
+    if not persona_names:
+        yield "Please pick at least one persona to compare!", "", []
+        return
+
+    results = []
+    sources = []
+    audio_paths = []
+
+    deadline = Deadline(DEFAULT_EXPLAIN_BUDGET + (DEFAULT_AUDIO_BUDGET if with_audio else 0))
+
+    try:
+        model_id, output_format = resolve_audio_preset(audio_quality)
+        updates = run_agent_multi(
+            topic,
+            persona_names,
+            audience,
+            with_audio=with_audio,
+            deadline=deadline,
+            model_id=model_id,
+            output_format=output_format,
+        )
+        first = next(updates)
+    except (UnknownPersonaError, ValueError) as e:
+        raise gr.Error(str(e))
+
+    for update in itertools.chain([first], updates):
+        if update["type"] == "step":
+            if "sources" in update:
+                sources = update["sources"]
+            continue
+
+        if update["type"] == "audio":
+            audio_paths.append(save_audio(update["audio"], update["output_format"], update["persona"]))
+        elif update["type"] == "error" and update["stage"] == "audio":
+            gr.Warning(f"Audio for {update['persona']} failed: {update['error']}")
+            continue
+        else:
+            results.append(update)
+
+        yield format_comparison(results), format_sources(sources), list(audio_paths)
+
+    yield format_comparison(results), format_sources(sources), list(audio_paths)
+
+
+def generate_audio(explanation: str, persona_name: str, audio_quality: str = "", progress=gr.Progress()):
+    """Generate audio from the explanation text.
+
+    audio_quality is an AUDIO_PRESETS name or a raw ElevenLabs output format;
+    empty uses the persona's, then the deployment's, model and format.
+    """
     if not explanation or not explanation.strip():
         return None
 
     if not persona_name:
-        persona_name = "5-Year-Old"
+        persona_name = PERSONAS.default.name
 
-    persona = get_persona(persona_name)
-    voice_id = persona["voice_id"]
-    voice_settings = persona.get("voice_settings")
+    try:
+        persona = get_persona(persona_name)
+        model_id, output_format = persona.audio_options(*resolve_audio_preset(audio_quality))
+    except (UnknownPersonaError, ValueError) as e:
+        raise gr.Error(str(e))
 
     progress(0.3, desc="🔊 Generating audio...")
 
+    deadline = Deadline(DEFAULT_AUDIO_BUDGET)
+
     try:
-        audio_bytes = generate_speech(explanation, voice_id, voice_settings)
-        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as f:
-            f.write(audio_bytes)
-            audio_path = f.name
+        audio_bytes = generate_speech(
+            explanation,
+            persona.voice_id,
+            persona.tts_settings,
+            deadline=deadline,
+            model_id=model_id,
+            output_format=output_format,
+        )
+        audio_path = save_audio(audio_bytes, output_format)
         progress(1.0, desc="✅ Audio ready!")
         return audio_path
+    except DeadlineExceeded:
+        progress(1.0, desc="⏱️ Audio timed out")
+        raise gr.Error(f"Audio generation took longer than {deadline.budget:.0f}s. Please try again!")
     except Exception as e:
         progress(1.0, desc="❌ Audio failed")
         raise gr.Error(f"Audio generation failed: {str(e)}")
 
 
+def request_headers(request: gr.Request | None) -> dict:
+    """Headers of the HTTP request behind a Gradio event (empty if there is none)."""
+    if request is None or request.headers is None:
+        return {}
+    return request.headers
+
+
+def usage_client(request: gr.Request | None) -> str:
+    """Which kind of client (MCP or UI) an event came from, for usage accounting."""
+    url = getattr(request, "url", None) if request is not None else None
+    return usage.detect_client(request_headers(request), url.path if url is not None else "")
+
+
+def persona_key(persona: str) -> str:
+    """Persona name for accounting, whether given as a name or a UI label."""
+    try:
+        return get_persona(persona).name
+    except UnknownPersonaError:
+        return persona
+
+
+def debug_profile(http_request: Request, request: int | None = None, window: int = 60):
+    """Collapsed-stack profile of one request (?request=<id>) or the last `window` seconds."""
+    if not profiling.authorized(http_request.headers):
+        return PlainTextResponse("Missing or wrong X-Explainor-Profile token\n", status_code=403)
+    if request is not None:
+        output = profiling.PROFILER.request_profile(request)
+        if output is None:
+            return PlainTextResponse(f"No profile for request {request}\n", status_code=404)
+        return PlainTextResponse(output)
+    return PlainTextResponse(profiling.PROFILER.window_profile(min(window, profiling.MAX_WINDOW)))
+
+
+def debug_profile_requests(http_request: Request):
+    """Recently profiled requests, for picking an id to pass to /debug/profile."""
+    if not profiling.authorized(http_request.headers):
+        return JSONResponse({"error": "Missing or wrong X-Explainor-Profile token"}, status_code=403)
+    return JSONResponse(profiling.PROFILER.sessions())
+
+
 def create_app():
     """Create and configure the Gradio app."""
 
     # Build persona choices
-    persona_choices = [
-        f"{PERSONAS[name]['emoji']} {name}"
-        for name in get_persona_names()
-    ]
+    persona_choices = get_persona_labels()
+
+    # Audio quality/latency presets
+    audio_quality_choices = list(AUDIO_PRESETS)
 
     # Audience choices
     audience_choices = [
@@ -200,86 +424,142 @@ def create_app():
             elem_classes=["header-container"]
         )
 
-        # ===== INPUT SECTION =====
-        with gr.Group():
-            # Topic input - full width, prominent
-            topic_input = gr.Textbox(
-                label="What do you want to learn about?",
-                placeholder="Try: Quantum Computing, Blockchain, Black Holes, Climate Change...",
-                lines=1,
-                scale=2,
-            )
-
-            # Persona and Audience in one row
-            with gr.Row():
-                persona_dropdown = gr.Dropdown(
-                    choices=persona_choices,
-                    value=persona_choices[0],
-                    label="🎭 Explainer",
-                    scale=1,
-                )
-                audience_dropdown = gr.Dropdown(
-                    choices=audience_choices,
-                    value=audience_choices[0],
-                    label="👤 Audience",
-                    scale=1,
+        with gr.Tabs():
+            # ===== EXPLAIN TAB =====
+            with gr.TabItem("✨ Explain"):
+                # ===== INPUT SECTION =====
+                with gr.Group():
+                    # Topic input - full width, prominent
+                    topic_input = gr.Textbox(
+                        label="What do you want to learn about?",
+                        placeholder="Try: Quantum Computing, Blockchain, Black Holes, Climate Change...",
+                        lines=1,
+                        scale=2,
+                    )
+
+                    # Persona and Audience in one row
+                    with gr.Row():
+                        persona_dropdown = gr.Dropdown(
+                            choices=persona_choices,
+                            value=persona_choices[0],
+                            label="🎭 Explainer",
+                            scale=1,
+                        )
+                        audience_dropdown = gr.Dropdown(
+                            choices=audience_choices,
+                            value=audience_choices[0],
+                            label="👤 Audience",
+                            scale=1,
+                        )
+
+                # ===== ACTION BUTTON =====
+                explain_btn = gr.Button(
+                    "✨ Explain it to me!",
+                    variant="primary",
+                    size="lg",
+                    elem_classes=["primary-btn"],
                 )
 
-        # ===== ACTION BUTTON =====
-        explain_btn = gr.Button(
-            "✨ Explain it to me!",
-            variant="primary",
-            size="lg",
-            elem_classes=["primary-btn"],
-        )
-
-        # ===== OUTPUT SECTION =====
-        with gr.Group():
-            explanation_output = gr.Textbox(
-                label="📖 Explanation",
-                lines=6,
-            )
-
-            # Audio controls in a row
-            with gr.Row():
-                read_aloud_btn = gr.Button(
-                    "🔊 Read Aloud",
-                    variant="secondary",
-                    scale=1,
+                # ===== OUTPUT SECTION =====
+                with gr.Group():
+                    explanation_output = gr.Textbox(
+                        label="📖 Explanation",
+                        lines=6,
+                    )
+
+                    # Audio controls in a row
+                    with gr.Row():
+                        read_aloud_btn = gr.Button(
+                            "🔊 Read Aloud",
+                            variant="secondary",
+                            scale=1,
+                        )
+                        audio_quality_dropdown = gr.Dropdown(
+                            choices=audio_quality_choices,
+                            value=audio_quality_choices[0],
+                            label="🎚️ Audio quality",
+                            scale=1,
+                        )
+                        audio_output = gr.Audio(
+                            label="Listen",
+                            type="filepath",
+                            autoplay=True,
+                            scale=3,
+                        )
+
+                # ===== DETAILS SECTION (Tabs) =====
+                with gr.Accordion("📊 Details", open=False):
+                    with gr.Tabs():
+                        with gr.TabItem("🔧 Agent Tools"):
+                            mcp_output = gr.Markdown("*Run an explanation to see tool calls*")
+
+                        with gr.TabItem("📚 Sources"):
+                            sources_output = gr.Markdown("*Sources will appear here*")
+
+                        with gr.TabItem("🔍 Trace"):
+                            steps_output = gr.Markdown("*Execution trace will appear here*")
+
+                # ===== EXAMPLES =====
+                gr.Markdown("### 💡 Try these examples")
+                gr.Examples(
+                    examples=[
+                        ["Quantum Computing", "👶 5-Year-Old"],
+                        ["Blockchain", "👨‍🍳 Gordon Ramsay"],
+                        ["Black Holes", "🏴‍☠️ Pirate"],
+                        ["Machine Learning", "🎭 Shakespeare"],
+                        ["Climate Change", "🏄 Surfer Dude"],
+                        ["The Force", "🧙 Yoda"],
+                    ],
+                    inputs=[topic_input, persona_dropdown],
+                    label="",
                 )
-                audio_output = gr.Audio(
-                    label="Listen",
-                    type="filepath",
-                    autoplay=True,
-                    scale=3,
+
+            # ===== COMPARE TAB =====
+            with gr.TabItem("⚖️ Compare"):
+                with gr.Group():
+                    compare_topic_input = gr.Textbox(
+                        label="What do you want to learn about?",
+                        placeholder="One topic, explained by several characters at once...",
+                        lines=1,
+                    )
+                    compare_personas = gr.CheckboxGroup(
+                        choices=persona_choices,
+                        value=persona_choices[:3],
+                        label="🎭 Explainers",
+                    )
+                    with gr.Row():
+                        compare_audience_dropdown = gr.Dropdown(
+                            choices=audience_choices,
+                            value=audience_choices[0],
+                            label="👤 Audience",
+                            scale=2,
+                        )
+                        compare_audio_checkbox = gr.Checkbox(
+                            label="🔊 Read them all aloud",
+                            value=False,
+                            scale=1,
+                        )
+                        compare_quality_dropdown = gr.Dropdown(
+                            choices=audio_quality_choices,
+                            value=audio_quality_choices[0],
+                            label="🎚️ Audio quality",
+                            scale=1,
+                        )
+
+                compare_btn = gr.Button(
+                    "⚖️ Compare explanations",
+                    variant="primary",
+                    size="lg",
+                    elem_classes=["primary-btn"],
                 )
 
-        # ===== DETAILS SECTION (Tabs) =====
-        with gr.Accordion("📊 Details", open=False):
-            with gr.Tabs():
-                with gr.TabItem("🔧 Agent Tools"):
-                    mcp_output = gr.Markdown("*Run an explanation to see tool calls*")
-
-                with gr.TabItem("📚 Sources"):
-                    sources_output = gr.Markdown("*Sources will appear here*")
-
-                with gr.TabItem("🔍 Trace"):
-                    steps_output = gr.Markdown("*Execution trace will appear here*")
-
-        # ===== EXAMPLES =====
-        gr.Markdown("### 💡 Try these examples")
-        gr.Examples(
-            examples=[
-                ["Quantum Computing", "👶 5-Year-Old"],
-                ["Blockchain", "👨‍🍳 Gordon Ramsay"],
-                ["Black Holes", "🏴‍☠️ Pirate"],
-                ["Machine Learning", "🎭 Shakespeare"],
-                ["Climate Change", "🏄 Surfer Dude"],
-                ["The Force", "🧙 Yoda"],
-            ],
-            inputs=[topic_input, persona_dropdown],
-            label="",
-        )
+                compare_output = gr.Markdown("*Explanations will appear here as each character finishes*")
+                compare_audio_output = gr.File(
+                    label="🔊 Audio clips",
+                    file_count="multiple",
+                )
+                with gr.Accordion("📚 Sources", open=False):
+                    compare_sources_output = gr.Markdown("*Sources will appear here*")
 
         # ===== MCP INFO =====
         with gr.Accordion("🔌 MCP Server", open=False):
@@ -291,7 +571,9 @@ def create_app():
                 https://kaiser-data-mcp-1st-birthday-explainor.hf.space/gradio_api/mcp/sse
                 ```
 
-                **Available Tools:** `explain_topic`, `generate_audio`
+                **Available Tools:** `explain_topic`, `generate_audio`, `compare_personas`
+
+                **Live trace (SSE):** `/events/explain?topic=Black+Holes&persona=Pirate`
                 """
             )
 
@@ -308,16 +590,82 @@ def create_app():
         )
 
         # ===== EVENT HANDLERS =====
-        def process_and_explain(topic, persona_with_emoji, audience_with_emoji):
-            persona_name = persona_with_emoji.split(" ", 1)[1] if " " in persona_with_emoji else persona_with_emoji
+        def process_and_explain(topic, persona_with_emoji, audience_with_emoji, request: gr.Request = None):
             audience = ""
             if audience_with_emoji and "Just me" not in audience_with_emoji:
                 audience = audience_with_emoji.split(" ", 1)[1] if " " in audience_with_emoji else audience_with_emoji
-            return explain_topic(topic, persona_name, audience)
+            yield from usage.track_generator(
+                profiling.profile_generator(
+                    explain_topic(topic, persona_with_emoji, audience),
+                    "explain_topic",
+                    profiling.should_profile(request_headers(request)),
+                ),
+                "explain",
+                persona=persona_key(persona_with_emoji),
+                audience=audience,
+                client=usage_client(request),
+            )
 
-        def process_audio(explanation, persona_with_emoji):
-            persona_name = persona_with_emoji.split(" ", 1)[1] if " " in persona_with_emoji else persona_with_emoji
-            return generate_audio(explanation, persona_name)
+        def process_audio(explanation, persona_with_emoji, audio_quality, request: gr.Request = None):
+            """Read an explanation aloud in a persona's voice.
+
+            Args:
+                explanation: The text to speak
+                persona_with_emoji: Persona label, e.g. "🏴‍☠️ Pirate"
+                audio_quality: "⚙️ Default", "🎧 Standard", "⚡ Fast", "📱 Mobile" or
+                    "🔉 Uncompressed" - or a raw ElevenLabs output format like "opus_48000_64"
+            """
+            with (
+                usage.track("audio", persona_key(persona_with_emoji), client=usage_client(request)),
+                profiling.profile("generate_audio", profiling.should_profile(request_headers(request))),
+            ):
+                return generate_audio(explanation, persona_with_emoji, audio_quality)
+
+        def process_and_compare(
+            topic,
+            personas_with_emoji,
+            audience_with_emoji,
+            with_audio,
+            audio_quality,
+            request: gr.Request = None,
+        ):
+            """Explain one topic in several character voices at once.
+
+            Researches the topic once, then generates every persona's explanation
+            in parallel, streaming each one as it finishes.
+
+            Args:
+                topic: The topic to explain
+                personas_with_emoji: Persona labels to compare, e.g. ["👶 5-Year-Old", "🏴‍☠️ Pirate"]
+                audience_with_emoji: Audience label, e.g. "👵 Confused grandmother"
+                with_audio: Also synthesize an audio clip for every explanation
+                audio_quality: Audio preset or raw ElevenLabs output format (see process_audio)
+            """
+            persona_names = list(personas_with_emoji or [])
+            audience = ""
+            if audience_with_emoji and "Just me" not in audience_with_emoji:
+                audience = audience_with_emoji.split(" ", 1)[1] if " " in audience_with_emoji else audience_with_emoji
+            yield from usage.track_generator(
+                profiling.profile_generator(
+                    compare_topic(topic, persona_names, audience, with_audio, audio_quality),
+                    "compare_topic",
+                    profiling.should_profile(request_headers(request)),
+                ),
+                "compare",
+                audience=audience,
+                client=usage_client(request),
+            )
+
+        # Pick up personas added to the data file since startup
+        def refresh_personas():
+            labels = get_persona_labels()
+            return gr.update(choices=labels), gr.update(choices=labels)
+
+        app.load(
+            fn=refresh_personas,
+            outputs=[persona_dropdown, compare_personas],
+            api_visibility="private",
+        )
 
         # Explain button click
         explain_btn.click(
@@ -336,10 +684,24 @@ def create_app():
         # Read aloud button
         read_aloud_btn.click(
             fn=process_audio,
-            inputs=[explanation_output, persona_dropdown],
+            inputs=[explanation_output, persona_dropdown, audio_quality_dropdown],
             outputs=[audio_output],
         )
 
+        # Compare button click
+        compare_btn.click(
+            fn=process_and_compare,
+            inputs=[
+                compare_topic_input,
+                compare_personas,
+                compare_audience_dropdown,
+                compare_audio_checkbox,
+                compare_quality_dropdown,
+            ],
+            outputs=[compare_output, compare_sources_output, compare_audio_output],
+            api_name="compare_personas",
+        )
+
     return app
 
 
@@ -355,4 +717,15 @@ if __name__ == "__main__":
         share=False,
         mcp_server=enable_mcp,
         css=CUSTOM_CSS,
+        prevent_thread_lock=True,
     )
+
+    # Structured agent events for MCP/HTTP clients that want the live trace
+    app.app.add_api_route("/events/explain", explain_events, methods=["GET"])
+
+    # Debug endpoints are only mounted when profiling is on and a token guards them
+    if profiling.enabled() and profiling.PROFILE_TOKEN:
+        app.app.add_api_route("/debug/profile", debug_profile, methods=["GET"])
+        app.app.add_api_route("/debug/profile/requests", debug_profile_requests, methods=["GET"])
+
+    app.block_thread()
@@ -66,7 +66,7 @@ for i in {1..30}; do
     RESULT=$(curl -s "${MCP_URL}/call/process_and_explain/${EVENT_ID}" 2>/dev/null)
 
     if echo "$RESULT" | grep -q "event: complete"; then
-        EXPLANATION=$(echo "$RESULT" | grep "^data:" | head -1 | sed 's/^data: //' | python3 -c "import sys,json; print(json.load(sys.stdin)[0])" 2>/dev/null)
+        EXPLANATION=$(echo "$RESULT" | sed -n '/^event: complete/{n;p;}' | sed 's/^data: //' | python3 -c "import sys,json; print(json.load(sys.stdin)[0])" 2>/dev/null)
         echo ""
         echo -e "${GREEN}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━${NC}"
         echo -e "${GREEN}  👶 5-Year-Old says:${NC}"
@@ -1,15 +1,36 @@
 """Explainor - AI agent that explains topics in persona voices."""
 
-from .personas import PERSONAS, get_persona, get_persona_names
-from .agent import run_agent, research_topic
-from .tts import generate_speech, generate_speech_file
+from .personas import (
+    PERSONAS,
+    Persona,
+    PersonaRegistry,
+    UnknownPersonaError,
+    get_persona,
+    get_persona_labels,
+    get_persona_names,
+)
+from .agent import run_agent, run_agent_multi, research_topic
+from .tts import AUDIO_PRESETS, generate_speech, generate_speech_file
+from .deadline import Deadline, DeadlineExceeded
+from .length import get_length_stats
+from .usage import summarize as summarize_usage
 
 __all__ = [
     "PERSONAS",
+    "Persona",
+    "PersonaRegistry",
+    "UnknownPersonaError",
     "get_persona",
+    "get_persona_labels",
     "get_persona_names",
     "run_agent",
+    "run_agent_multi",
     "research_topic",
     "generate_speech",
     "generate_speech_file",
+    "AUDIO_PRESETS",
+    "Deadline",
+    "DeadlineExceeded",
+    "get_length_stats",
+    "summarize_usage",
 ]
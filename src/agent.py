@@ -2,38 +2,100 @@
 
 import os
 import json
+import time
+import contextvars
 import httpx
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import Generator
 
+from . import cassette, knowledge, profiling, usage
 from .personas import get_persona
+from .tts import generate_speech
+from .deadline import Deadline, DeadlineExceeded, DEFAULT_EXPLAIN_BUDGET
+from .length import (
+    LENGTH_STATS,
+    LONG_EXPLANATION_SECONDS,
+    cut_at_sentence,
+    estimate_tokens,
+    max_tokens_for,
+    word_budget,
+)
 
 
 # Nebius API configuration (OpenAI-compatible)
 NEBIUS_API_BASE = "https://api.studio.nebius.com/v1"
 NEBIUS_MODEL = "meta-llama/Llama-3.3-70B-Instruct"
 
+# Per-stage timeout caps (the request deadline may shorten them further)
+SEARCH_TIMEOUT = 10.0
+LLM_TIMEOUT = 60.0
+
+# Seconds of the deadline kept back for the LLM when sizing the web search
+# (at most half the budget, so short deadlines still get some research)
+LLM_RESERVE = 20.0
+
+# A search timeout shorter than this is not worth starting - skip research
+MIN_SEARCH_TIMEOUT = 2.0
+
+# Local knowledge tier: hits below this BM25 score are ignored, and a hit
+# whose title names exactly the topic (match 1.0) skips the web entirely
+LOCAL_MIN_SCORE = 1.0
+
+# When web research fails, inexact local hits stand in only above this score
+LOCAL_FALLBACK_SCORE = 5.0
+
 
 def get_nebius_client():
     """Get configured httpx client for Nebius API."""
     api_key = os.getenv("NEBIUS_API_KEY")
+    if not api_key and cassette.replaying():
+        return "replay"
     if not api_key:
         raise ValueError("NEBIUS_API_KEY environment variable not set")
     return api_key
 
 
-def web_search(query: str) -> dict:
+def general_knowledge_result(query: str) -> dict:
+    """Placeholder result used when no web research is available."""
+    return {
+        "title": f"Search: {query}",
+        "snippet": f"Topic: {query}. Please explain this concept based on general knowledge.",
+        "source": "General Knowledge",
+        "url": "",
+    }
+
+
+def search_timeout(deadline: Deadline | None) -> float | None:
+    """Timeout for web research that leaves the LLM its reserve.
+
+    min(SEARCH_TIMEOUT, remaining - reserve), or None when that is below
+    MIN_SEARCH_TIMEOUT and research should be skipped.
+    """
+    if deadline is None:
+        return SEARCH_TIMEOUT
+    reserve = min(LLM_RESERVE, deadline.budget / 2)
+    timeout = min(SEARCH_TIMEOUT, deadline.remaining() - reserve)
+    return timeout if timeout >= MIN_SEARCH_TIMEOUT else None
+
+
+def web_search(query: str, deadline: Deadline | None = None) -> dict:
     """Perform web search using DuckDuckGo (no API key needed).
 
     Returns structured search results.
     """
     try:
+        timeout = search_timeout(deadline)
+        if timeout is None:
+            raise DeadlineExceeded("Not enough time left for web research")
+
         # Use DuckDuckGo HTML search (no API needed)
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
         }
 
-        with httpx.Client(timeout=10.0) as client:
+        with httpx.Client(timeout=timeout, transport=cassette.get_transport()) as client:
             # DuckDuckGo instant answer API
+            started = time.perf_counter()
             resp = client.get(
                 "https://api.duckduckgo.com/",
                 params={
@@ -45,6 +107,7 @@ def web_search(query: str) -> dict:
                 headers=headers,
             )
             data = resp.json()
+            usage.record(search_seconds=time.perf_counter() - started)
 
             results = []
 
@@ -69,63 +132,199 @@ def web_search(query: str) -> dict:
 
             # If no results, try a simpler search
             if not results:
-                results.append({
-                    "title": f"Search: {query}",
-                    "snippet": f"Topic: {query}. Please explain this concept based on general knowledge.",
-                    "source": "General Knowledge",
-                    "url": "",
-                })
+                results.append(general_knowledge_result(query))
 
             return {"results": results, "query": query}
 
     except Exception as e:
         return {
-            "results": [{
-                "title": f"Search: {query}",
-                "snippet": f"Topic: {query}. Please explain this concept based on general knowledge.",
-                "source": "General Knowledge",
-                "url": "",
-            }],
+            "results": [general_knowledge_result(query)],
             "query": query,
             "error": str(e),
         }
 
 
-def call_llm(messages: list[dict], max_tokens: int = 1500) -> str:
-    """Call Nebius LLM API."""
+def call_llm(
+    messages: list[dict],
+    max_tokens: int = 1500,
+    deadline: Deadline | None = None,
+    word_budget: int | None = None,
+) -> str:
+    """Call Nebius LLM API.
+
+    The HTTP timeout is sized from the request deadline, so an expiring
+    request cancels the in-flight completion instead of waiting it out.
+
+    With a word_budget the completion is streamed and cut at the first
+    sentence boundary past the budget, closing the stream early.
+    """
     api_key = get_nebius_client()
+    timeout = deadline.timeout(LLM_TIMEOUT) if deadline else LLM_TIMEOUT
+
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+    payload = {
+        "model": NEBIUS_MODEL,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": 0.8,
+    }
 
+    started = time.perf_counter()
     try:
-        with httpx.Client(timeout=60.0) as client:
+        with httpx.Client(timeout=timeout, transport=cassette.get_transport()) as client:
+            if word_budget:
+                return stream_llm(client, headers, payload, word_budget, deadline)
+
             resp = client.post(
                 f"{NEBIUS_API_BASE}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": NEBIUS_MODEL,
-                    "messages": messages,
-                    "max_tokens": max_tokens,
-                    "temperature": 0.8,
-                },
+                headers=headers,
+                json=payload,
             )
             resp.raise_for_status()
             data = resp.json()
-            return data["choices"][0]["message"]["content"]
+            content = data["choices"][0]["message"]["content"]
+            tokens = data.get("usage") or {}
+            used = tokens.get("completion_tokens") or estimate_tokens(content)
+            LENGTH_STATS.record(max_tokens, used)
+            usage.record(
+                prompt_tokens=tokens.get("prompt_tokens") or estimate_prompt_tokens(messages),
+                completion_tokens=used,
+            )
+            return content
     except httpx.HTTPStatusError as e:
         raise Exception(f"Nebius API error: {e.response.status_code} - {e.response.text}")
+    except httpx.TimeoutException as e:
+        if deadline and deadline.expired():
+            raise DeadlineExceeded(f"Request deadline of {deadline.budget:.0f}s exceeded") from e
+        raise Exception(f"LLM call failed: {str(e)}")
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         raise Exception(f"LLM call failed: {str(e)}")
+    finally:
+        usage.record(llm_seconds=time.perf_counter() - started)
+
+
+def estimate_prompt_tokens(messages: list[dict]) -> int:
+    """Rough prompt size (~4 characters per token) when the API reports none."""
+    return sum(len(message["content"]) for message in messages) // 4
+
+
+def stream_llm(
+    client: httpx.Client,
+    headers: dict,
+    payload: dict,
+    word_budget: int,
+    deadline: Deadline | None = None,
+) -> str:
+    """Stream a chat completion, stopping at a sentence end past word_budget.
+
+    Token usage comes from the final usage chunk; when the stream is cut before
+    it arrives, both prompt and completion tokens are estimated from the text.
+    """
+    text = ""
+    tokens = {}
+
+    with client.stream(
+        "POST",
+        f"{NEBIUS_API_BASE}/chat/completions",
+        headers=headers,
+        json={**payload, "stream": True, "stream_options": {"include_usage": True}},
+    ) as resp:
+        if resp.is_error:
+            resp.read()
+        resp.raise_for_status()
+
+        for line in resp.iter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+
+            if deadline:
+                deadline.check()
+
+            event = json.loads(data)
+            tokens = event.get("usage") or tokens
+            choices = event.get("choices") or [{}]
+            delta = choices[0].get("delta", {}).get("content") or ""
+            if not delta:
+                continue
+            text += delta
+
+            cut = cut_at_sentence(text, word_budget)
+            if cut is not None:
+                # Leaving the block closes the connection - the rest is never generated
+                used = estimate_tokens(text)
+                discarded = text[len(cut):]
+                LENGTH_STATS.record(payload["max_tokens"], used, discarded)
+                usage.record(
+                    prompt_tokens=estimate_prompt_tokens(payload["messages"]),
+                    completion_tokens=used,
+                    early_stops=1,
+                    tokens_cut=estimate_tokens(discarded),
+                )
+                return cut
+
+    used = tokens.get("completion_tokens") or estimate_tokens(text)
+    LENGTH_STATS.record(payload["max_tokens"], used)
+    usage.record(
+        prompt_tokens=tokens.get("prompt_tokens") or estimate_prompt_tokens(payload["messages"]),
+        completion_tokens=used,
+    )
+    return cut_at_sentence(text, word_budget, final=True) or text
+
+
+def local_results(hits: list[dict]) -> list[dict]:
+    """Convert local knowledge index hits into search results."""
+    return [
+        {
+            "title": hit["title"],
+            "snippet": hit["snippet"],
+            "source": f"{hit['source']} (local)",
+            "url": hit["url"],
+        }
+        for hit in hits
+    ]
 
 
-def research_topic(topic: str) -> tuple[str, list[dict]]:
-    """Research a topic using web search.
+def research_topic(topic: str, deadline: Deadline | None = None) -> tuple[str, list[dict]]:
+    """Research a topic, trying the local knowledge index before the web.
+
+    Tiers, fastest first:
+    1. A local index article about exactly this topic is used as-is, with
+       no network round-trip.
+    2. Otherwise the topic is searched on the web.
+    3. If web research fails, times out, finds nothing or is skipped because
+       the deadline is close, strong local matches stand in. Without any,
+       the LLM falls back on general knowledge.
 
     Returns: (research_summary, sources_list)
     """
-    # Perform search
-    search_results = web_search(topic)
+    hits = knowledge.search(topic)
+    relevant = [hit for hit in hits if hit["score"] >= LOCAL_MIN_SCORE]
+    exact = [hit for hit in relevant if hit["match"] == 1.0]
+
+    if exact:
+        search_results = {"results": local_results(exact[:1]), "query": topic}
+        usage.record(cache_hits=1)
+    else:
+        if search_timeout(deadline) is None:
+            search_results = {"results": [general_knowledge_result(topic)], "query": topic, "skipped": True}
+        else:
+            search_results = web_search(topic, deadline)
+
+        web_failed = "error" in search_results or "skipped" in search_results or all(
+            result["source"] == "General Knowledge" for result in search_results["results"]
+        )
+        # A weak local match is worse than the honest general-knowledge placeholder
+        on_topic = [hit for hit in relevant if hit["score"] >= LOCAL_FALLBACK_SCORE]
+        if web_failed and on_topic:
+            search_results = {"results": local_results(on_topic), "query": topic}
 
     # Format research for the agent
     research_text = f"## Research on: {topic}\n\n"
@@ -154,6 +353,7 @@ def generate_explanation(
     Yields dicts with: {"step": str, "content": str}
     """
     persona = get_persona(persona_name)
+    words = word_budget(LONG_EXPLANATION_SECONDS, persona.voice_settings["speed"])
 
     # Step 1: Acknowledge the task
     yield {
@@ -173,12 +373,12 @@ def generate_explanation(
     messages = [
         {
             "role": "system",
-            "content": f"""{persona['system_prompt']}
+            "content": f"""{persona.system_prompt}
 
 You are explaining a topic to someone. Your explanation should be:
 1. Entertaining and fully in character
 2. Educational - actually explain the concept clearly
-3. About 150-200 words (suitable for audio)
+3. About {words} words (suitable for audio)
 4. Natural spoken language (will be read aloud)
 
 Do NOT break character. Do NOT use markdown formatting or bullet points.
@@ -194,11 +394,11 @@ Now explain "{topic}" in your unique voice and style. Make it fun and educationa
         },
     ]
 
-    explanation = call_llm(messages)
+    explanation = call_llm(messages, max_tokens=max_tokens_for(words), word_budget=words)
 
     yield {
         "step": "explanation",
-        "title": f"{persona['emoji']} Explanation ready",
+        "title": f"{persona.emoji} Explanation ready",
         "content": explanation,
     }
 
@@ -216,20 +416,94 @@ def format_tool_call(tool_name: str, inputs: dict, output_summary: str) -> str:
 ```"""
 
 
-def run_agent(topic: str, persona_name: str, audience: str = "") -> Generator[dict, None, None]:
+# Tools used in the agent pipeline
+MCP_TOOLS = [
+    {"name": "web_search", "icon": "🔍", "desc": "Web research via DuckDuckGo API"},
+    {"name": "extract_facts", "icon": "📋", "desc": "Key fact extraction from sources"},
+    {"name": "persona_transform", "icon": "🎭", "desc": "Persona explanation via Nebius LLM"},
+]
+
+# Upper bound on concurrent persona LLM/TTS calls in run_agent_multi
+MAX_PARALLEL_PERSONAS = 6
+
+
+def explain_as_persona(
+    topic: str,
+    persona_name: str,
+    research: str,
+    audience: str = "",
+    deadline: Deadline | None = None,
+) -> str:
+    """Turn research into a spoken explanation in one persona's voice."""
+    # Sized to ~40s of audio at this persona's voice speed
+    persona = get_persona(persona_name)
+    words = persona.word_budget
+
+    # Build audience context
+    audience_context = ""
+    if audience and audience.strip():
+        audience_context = f"\nYou are explaining this to: {audience.strip()}. Tailor your explanation appropriately for them."
+
+    messages = [
+        {
+            "role": "system",
+            "content": f"""{persona.system_prompt}
+
+You are explaining a topic to someone. Your explanation should be:
+1. Entertaining and fully in character
+2. Educational - actually explain the concept clearly
+3. MAXIMUM {words} words - be concise!
+4. Natural spoken language (will be read aloud)
+5. Engaging and memorable{audience_context}
+
+Do NOT break character. Do NOT use markdown, bullet points, or special formatting.
+Just speak naturally as your character would.""",
+        },
+        {
+            "role": "user",
+            "content": f"""Research on the topic:
+
+{research}
+
+Now explain "{topic}" in your unique {persona.name} voice and style. Make it fun, memorable, and educational!""",
+        },
+    ]
+
+    return call_llm(
+        messages,
+        max_tokens=max_tokens_for(words),
+        deadline=deadline,
+        word_budget=words,
+    )
+
+
+def run_agent(
+    topic: str,
+    persona_name: str,
+    audience: str = "",
+    deadline: Deadline | None = None,
+) -> Generator[dict, None, None]:
     """Run the full agent pipeline with tool orchestration.
 
-    Yields progress updates and final results.
+    Yields progress updates and final results. Every upstream call shares
+    the same deadline; raises DeadlineExceeded when it runs out.
     """
+    if deadline is None:
+        deadline = Deadline(DEFAULT_EXPLAIN_BUDGET)
+
+    # Resolve the persona before spending time on research
+    persona = get_persona(persona_name)
+
     # Tool 1: web_search (DuckDuckGo)
     yield {
         "type": "step",
         "step": "research",
+        "tool": "web_search",
         "title": "🔧 Tool: `web_search`",
         "content": format_tool_call("web_search", {"query": topic, "max_results": 5}, "Searching..."),
     }
 
-    research, sources = research_topic(topic)
+    research, sources = research_topic(topic, deadline)
 
     yield {
         "type": "step",
@@ -243,75 +517,143 @@ def run_agent(topic: str, persona_name: str, audience: str = "") -> Generator[di
     yield {
         "type": "step",
         "step": "extracting",
+        "tool": "extract_facts",
         "title": "🔧 Tool: `extract_facts`",
         "content": format_tool_call("extract_facts", {"text": f"[{len(sources)} source documents]", "max_facts": 5}, "Extracting key facts..."),
     }
 
-    # Generate explanation
-    persona = get_persona(persona_name)
-
-    # Build audience context
-    audience_context = ""
-    if audience and audience.strip():
-        audience_context = f"\nYou are explaining this to: {audience.strip()}. Tailor your explanation appropriately for them."
-
     # Tool 3: persona_transform (Nebius LLM)
     yield {
         "type": "step",
         "step": "generating",
+        "tool": "persona_transform",
         "title": "🔧 Tool: `persona_transform`",
         "content": format_tool_call(
             "persona_transform",
             {
-                "persona": persona_name,
+                "persona": persona.name,
                 "audience": audience if audience else "general",
-                "style": persona["system_prompt"][:50] + "...",
+                "style": persona.style_hint,
             },
             "Generating explanation..."
         ),
     }
 
-    messages = [
-        {
-            "role": "system",
-            "content": f"""{persona['system_prompt']}
+    explanation = explain_as_persona(topic, persona.name, research, audience, deadline)
 
-You are explaining a topic to someone. Your explanation should be:
-1. Entertaining and fully in character
-2. Educational - actually explain the concept clearly
-3. MAXIMUM 100 words - be concise!
-4. Natural spoken language (will be read aloud)
-5. Engaging and memorable{audience_context}
+    yield {
+        "type": "result",
+        "explanation": explanation,
+        "sources": sources,
+        "persona": persona.name,
+        "persona_emoji": persona.emoji,
+        "voice_id": persona.voice_id,
+        "voice_settings": dict(persona.voice_settings),
+        "mcp_tools": MCP_TOOLS,
+    }
 
-Do NOT break character. Do NOT use markdown, bullet points, or special formatting.
-Just speak naturally as your character would.""",
-        },
-        {
-            "role": "user",
-            "content": f"""Research on the topic:
 
-{research}
+def run_agent_multi(
+    topic: str,
+    personas: list[str],
+    audience: str = "",
+    with_audio: bool = False,
+    deadline: Deadline | None = None,
+    model_id: str | None = None,
+    output_format: str | None = None,
+) -> Generator[dict, None, None]:
+    """Explain one topic in several persona voices from a single research pass.
 
-Now explain "{topic}" in your unique {persona_name} voice and style. Make it fun, memorable, and educational!""",
-        },
-    ]
+    Persona LLM calls (and optional TTS) run concurrently. Yields the research
+    step, then one "result" per persona and, with audio, one "audio" update
+    per clip - each as soon as it finishes. Per-persona failures are yielded
+    as "error" updates so one slow persona does not sink the others.
+    model_id/output_format override each persona's TTS defaults.
+    """
+    if deadline is None:
+        deadline = Deadline(DEFAULT_EXPLAIN_BUDGET)
 
-    explanation = call_llm(messages)
+    # Resolve every persona before spending time on research; a persona given
+    # twice (e.g. by name and by label) runs - and is billed - once
+    resolved = list({persona.name: persona for persona in map(get_persona, personas)}.values())
 
-    # Track tools used in pipeline
-    mcp_tools = [
-        {"name": "web_search", "icon": "🔍", "desc": "Web research via DuckDuckGo API"},
-        {"name": "extract_facts", "icon": "📋", "desc": "Key fact extraction from sources"},
-        {"name": "persona_transform", "icon": "🎭", "desc": "Persona explanation via Nebius LLM"},
-    ]
+    yield {
+        "type": "step",
+        "step": "research",
+        "tool": "web_search",
+        "title": "🔧 Tool: `web_search`",
+        "content": format_tool_call("web_search", {"query": topic, "max_results": 5}, "Searching..."),
+    }
+
+    research, sources = research_topic(topic, deadline)
 
     yield {
-        "type": "result",
-        "explanation": explanation,
+        "type": "step",
+        "step": "research_done",
+        "title": "✅ Response: `web_search`",
+        "content": format_tool_call("web_search", {"query": topic}, f"Found {len(sources)} sources"),
         "sources": sources,
-        "persona": persona_name,
-        "persona_emoji": persona["emoji"],
-        "voice_id": persona["voice_id"],
-        "voice_settings": persona.get("voice_settings"),
-        "mcp_tools": mcp_tools,
     }
+
+    # Each persona's LLM and TTS usage is accounted to its own record
+    records = {persona.name: usage.child(persona.name) for persona in resolved}
+
+    workers = max(1, min(len(resolved), MAX_PARALLEL_PERSONAS))
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        pending = {
+            pool.submit(
+                contextvars.copy_context().run,
+                usage.bind(profiling.propagate(explain_as_persona), records[persona.name]),
+                topic, persona.name, research, audience, deadline,
+            ): ("result", persona)
+            for persona in resolved
+        }
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, persona = pending.pop(future)
+
+                try:
+                    value = future.result()
+                except Exception as e:
+                    yield {"type": "error", "stage": kind, "persona": persona.name, "error": str(e)}
+                    continue
+
+                if kind == "result":
+                    yield {
+                        "type": "result",
+                        "explanation": value,
+                        "sources": sources,
+                        "persona": persona.name,
+                        "persona_emoji": persona.emoji,
+                        "voice_id": persona.voice_id,
+                        "voice_settings": dict(persona.voice_settings),
+                        "mcp_tools": MCP_TOOLS,
+                    }
+                    if with_audio:
+                        tts_model, tts_format = persona.audio_options(model_id, output_format)
+                        tts = pool.submit(
+                            contextvars.copy_context().run,
+                            usage.bind(profiling.propagate(generate_speech), records[persona.name]),
+                            value,
+                            persona.voice_id,
+                            persona.tts_settings,
+                            deadline=deadline,
+                            model_id=tts_model,
+                            output_format=tts_format,
+                        )
+                        pending[tts] = ("audio", persona)
+                else:
+                    yield {
+                        "type": "audio",
+                        "persona": persona.name,
+                        "persona_emoji": persona.emoji,
+                        "audio": value,
+                        "output_format": persona.audio_options(model_id, output_format)[1],
+                    }
+    finally:
+        # A cancelled or disconnected compare must not wait for (and pay for)
+        # persona calls still queued - drop them and let running ones finish alone
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,271 @@
+"""Record/replay of upstream HTTP traffic for offline, repeatable runs.
+
+Every upstream call (DuckDuckGo, Nebius, ElevenLabs) goes through an httpx
+client built with get_transport(). With EXPLAINOR_CASSETTE set, that
+transport either records real exchanges - including time to first byte and
+per-chunk timing of streamed bodies - or replays them without touching the
+network:
+
+    EXPLAINOR_CASSETTE=runs/black-holes.jsonl.gz EXPLAINOR_CASSETTE_MODE=record python app.py
+    EXPLAINOR_CASSETTE=runs/black-holes.jsonl.gz EXPLAINOR_REPLAY_SPEED=10 python app.py
+
+Replay matches requests exactly (method, URL and body), so a changed prompt
+or persona fails with CassetteMiss instead of replaying another response.
+EXPLAINOR_REPLAY_MATCH=endpoint opts into loose matching for demos.
+
+A cassette is gzipped JSON Lines, one exchange per line. Request headers
+(and so API keys) are never written.
+
+    python -m src.cassette runs/black-holes.jsonl.gz   # summarize a cassette
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import httpx
+
+
+CASSETTE_PATH = os.getenv("EXPLAINOR_CASSETTE", "")
+CASSETTE_MODE = os.getenv("EXPLAINOR_CASSETTE_MODE", "replay").lower()
+
+# 1.0 replays at recorded speed, 10 ten times faster, 0 with no delays at all
+REPLAY_SPEED = float(os.getenv("EXPLAINOR_REPLAY_SPEED", "1.0"))
+
+# "exact" (default) or "endpoint" - also accept another body for the same URL
+REPLAY_MATCH = os.getenv("EXPLAINOR_REPLAY_MATCH", "exact").lower()
+
+CASSETTE_VERSION = 1
+
+# Response headers worth keeping; the rest is noise for replay
+KEPT_HEADERS = ("content-type", "content-encoding")
+
+
+class CassetteMiss(httpx.TransportError):
+    """No recorded exchange matches a request made during replay."""
+
+
+def request_key(request: httpx.Request) -> tuple[str, str, str]:
+    """(method, url, body digest) used to match requests to recordings."""
+    body = request.read() or b""
+    return request.method, str(request.url), hashlib.sha1(body).hexdigest()
+
+
+def _encode(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def _decode(data: str) -> bytes:
+    return base64.b64decode(data)
+
+
+class _RecordingStream(httpx.SyncByteStream):
+    """Pass a response body through while noting when each chunk arrived."""
+
+    def __init__(self, stream: httpx.SyncByteStream, entry: dict, started: float, on_close):
+        self._stream = stream
+        self._entry = entry
+        self._started = started
+        self._on_close = on_close
+        self._closed = False
+
+    def __iter__(self):
+        for chunk in self._stream:
+            self._entry["chunks"].append([round(time.monotonic() - self._started, 4), _encode(chunk)])
+            yield chunk
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._stream.close()
+        self._entry["elapsed"] = round(time.monotonic() - self._started, 4)
+        self._on_close(self._entry)
+
+
+class _ReplayStream(httpx.SyncByteStream):
+    """Yield recorded chunks, spaced out like the original response."""
+
+    def __init__(self, chunks: list, ttfb: float, speed: float):
+        self._chunks = chunks
+        self._ttfb = ttfb
+        self._speed = speed
+
+    def __iter__(self):
+        previous = self._ttfb
+        for offset, data in self._chunks:
+            if self._speed > 0:
+                time.sleep(max(0.0, offset - previous) / self._speed)
+            previous = offset
+            yield _decode(data)
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """Forward requests to the network and append each exchange to a cassette."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._inner = httpx.HTTPTransport()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(path):
+            self._append({"cassette": CASSETTE_VERSION})
+
+    def _append(self, record: dict) -> None:
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock, gzip.open(self.path, "at", encoding="utf-8") as f:
+            f.write(line)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        method, url, digest = request_key(request)
+        started = time.monotonic()
+        response = self._inner.handle_request(request)
+
+        entry = {
+            "method": method,
+            "url": url,
+            "body_sha1": digest,
+            "status": response.status_code,
+            "headers": {k: v for k, v in response.headers.items() if k.lower() in KEPT_HEADERS},
+            "ttfb": round(time.monotonic() - started, 4),
+            "chunks": [],
+        }
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, entry, started, self._append),
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        # Shared by every client; the pool lives as long as the process
+        pass
+
+
+class ReplayTransport(httpx.BaseTransport):
+    """Serve responses from a cassette instead of the network.
+
+    Requests are matched on method, URL and body. Identical requests consume
+    their recordings in order and then reuse the last one. With
+    match="endpoint", a request whose body differs (e.g. a prompt changed)
+    takes the next unused recording for the same URL, never a used one.
+    Anything else raises CassetteMiss.
+    """
+
+    def __init__(self, path: str, speed: float = REPLAY_SPEED, match: str = REPLAY_MATCH):
+        if match not in ("exact", "endpoint"):
+            raise ValueError(f"EXPLAINOR_REPLAY_MATCH must be 'exact' or 'endpoint', not {match!r}")
+        self.path = path
+        self.speed = speed
+        self.match = match
+        self._lock = threading.Lock()
+        self._exact = defaultdict(list)
+        self._endpoint = defaultdict(list)
+
+        for entry in load_cassette(path):
+            self._exact[(entry["method"], entry["url"], entry["body_sha1"])].append(entry)
+            self._endpoint[self._endpoint_key(entry["method"], entry["url"])].append(entry)
+
+    @staticmethod
+    def _endpoint_key(method: str, url: str) -> tuple[str, str]:
+        parts = urlsplit(url)
+        return method, f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+    @staticmethod
+    def _take(queue: list, reuse: bool) -> dict | None:
+        for entry in queue:
+            if not entry.get("_used"):
+                entry["_used"] = True
+                return entry
+        return queue[-1] if queue and reuse else None
+
+    def _match(self, request: httpx.Request) -> dict:
+        method, url, digest = request_key(request)
+        with self._lock:
+            entry = self._take(self._exact[(method, url, digest)], reuse=True)
+            if entry is None and self.match == "endpoint":
+                entry = self._take(self._endpoint[self._endpoint_key(method, url)], reuse=False)
+        if entry is None:
+            raise CassetteMiss(f"No recording for {method} {url} in {self.path}", request=request)
+        return entry
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        entry = self._match(request)
+        if self.speed > 0:
+            time.sleep(entry["ttfb"] / self.speed)
+        return httpx.Response(
+            status_code=entry["status"],
+            headers=entry["headers"],
+            stream=_ReplayStream(entry["chunks"], entry["ttfb"], self.speed),
+        )
+
+
+def load_cassette(path: str) -> list[dict]:
+    """Read all recorded exchanges from a cassette file."""
+    entries = []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if "cassette" in record:
+                if record["cassette"] > CASSETTE_VERSION:
+                    raise ValueError(f"{path} was written by a newer cassette format ({record['cassette']})")
+                continue
+            entries.append(record)
+    return entries
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> httpx.BaseTransport | None:
+    """Transport for upstream httpx clients, or None to use the network directly."""
+    global _transport
+    if not CASSETTE_PATH:
+        return None
+    with _transport_lock:
+        if _transport is None:
+            if CASSETTE_MODE == "record":
+                _transport = RecordingTransport(CASSETTE_PATH)
+            elif CASSETTE_MODE == "replay":
+                _transport = ReplayTransport(CASSETTE_PATH)
+            else:
+                raise ValueError(f"EXPLAINOR_CASSETTE_MODE must be 'record' or 'replay', not {CASSETTE_MODE!r}")
+    return _transport
+
+
+def replaying() -> bool:
+    """True when upstream calls are served from a cassette (no API keys needed)."""
+    return bool(CASSETTE_PATH) and CASSETTE_MODE == "replay"
+
+
+def summarize(path: str) -> str:
+    """One line per recorded exchange: status, timing, size and endpoint."""
+    lines = []
+    total = 0.0
+    for entry in load_cassette(path):
+        size = sum(len(_decode(data)) for _, data in entry["chunks"])
+        elapsed = entry.get("elapsed", entry["ttfb"])
+        total += elapsed
+        lines.append(
+            f"{entry['status']}  ttfb {entry['ttfb']:6.3f}s  total {elapsed:6.3f}s  "
+            f"{len(entry['chunks']):4d} chunks {size:8d} B  {entry['method']} {entry['url'][:80]}"
+        )
+    lines.append(f"{len(lines)} exchanges, {total:.3f}s upstream time")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m src.cassette CASSETTE")
+    print(summarize(sys.argv[1]))
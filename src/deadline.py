@@ -0,0 +1,52 @@
+"""Per-request time budget shared by every stage of the explain pipeline."""
+
+import os
+import time
+
+
+# Total wall-clock budget for one explanation (research + LLM)
+DEFAULT_EXPLAIN_BUDGET = float(os.getenv("EXPLAIN_DEADLINE_SECONDS", "45"))
+
+# Budget for a single "Read Aloud" synthesis
+DEFAULT_AUDIO_BUDGET = float(os.getenv("AUDIO_DEADLINE_SECONDS", "30"))
+
+# Never hand an HTTP client less than this - it would fail before connecting
+MIN_TIMEOUT = 0.5
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs out of its time budget."""
+
+
+class Deadline:
+    """Absolute deadline for one request, measured on the monotonic clock.
+
+    Each stage asks for a timeout sized from what is left, so a slow search
+    eats into the LLM budget instead of adding to the total.
+    """
+
+    def __init__(self, seconds: float):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left before expiry (never negative)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def timeout(self, cap: float) -> float:
+        """Timeout for the next upstream call: the stage cap or what is left.
+
+        Raises DeadlineExceeded if there is not enough time to make the call.
+        """
+        remaining = self.remaining()
+        if remaining < MIN_TIMEOUT:
+            raise DeadlineExceeded(f"Request deadline of {self.budget:.0f}s exceeded")
+        return min(cap, remaining)
+
+    def check(self) -> None:
+        """Raise DeadlineExceeded if the deadline has passed."""
+        if self.expired():
+            raise DeadlineExceeded(f"Request deadline of {self.budget:.0f}s exceeded")
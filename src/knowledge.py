@@ -0,0 +1,207 @@
+"""Local knowledge index: a fast research tier in front of web search.
+
+A BM25 inverted index over a curated corpus (data/knowledge/corpus.jsonl),
+built offline into one file whose postings are memory-mapped at query time:
+
+    python -m src.knowledge build data/knowledge/corpus.jsonl data/knowledge.idx
+    python -m src.knowledge query data/knowledge.idx "black holes"
+
+File layout: b"EXKI", format version and header length (uint32 each), a JSON
+header (documents, lengths, term -> [offset, df]), then the postings as packed
+(doc_id uint32, term frequency uint16) records.
+"""
+
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+
+INDEX_PATH = os.getenv(
+    "EXPLAINOR_KNOWLEDGE_INDEX",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "knowledge.idx"),
+)
+
+MAGIC = b"EXKI"
+INDEX_VERSION = 1
+PREAMBLE = struct.Struct("<4sII")
+POSTING = struct.Struct("<IH")
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Title terms count this many times, so a topic's own article outranks mentions
+TITLE_WEIGHT = 3
+
+STOPWORDS = frozenset(
+    "a an and are as at be by do does for from how in is it of on or the to what why with".split()
+)
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens without stopwords, with a light plural strip."""
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith("ies"):
+            token = token[:-3] + "y"
+        elif len(token) > 4 and token.endswith("oes"):
+            token = token[:-2]
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def build_index(corpus_path: str, index_path: str) -> int:
+    """Build an index file from a JSON Lines corpus. Returns the document count.
+
+    Each corpus line needs "title" and "snippet"; "source" and "url" are optional.
+    """
+    docs = []
+    with open(corpus_path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                docs.append(json.loads(line))
+
+    postings = defaultdict(list)
+    doc_lens = []
+    for doc_id, doc in enumerate(docs):
+        counts = Counter(tokenize(doc["snippet"]))
+        for token in tokenize(doc["title"]):
+            counts[token] += TITLE_WEIGHT
+        doc_lens.append(sum(counts.values()))
+        for token, tf in counts.items():
+            postings[token].append((doc_id, min(tf, 0xFFFF)))
+
+    terms = {}
+    body = bytearray()
+    for token in sorted(postings):
+        terms[token] = [len(body), len(postings[token])]
+        for doc_id, tf in postings[token]:
+            body += POSTING.pack(doc_id, tf)
+
+    header = json.dumps({
+        "docs": [
+            {
+                "title": doc["title"],
+                "snippet": doc["snippet"],
+                "source": doc.get("source", "Local Knowledge"),
+                "url": doc.get("url", ""),
+                "title_terms": sorted(set(tokenize(doc["title"]))),
+            }
+            for doc in docs
+        ],
+        "doc_lens": doc_lens,
+        "avgdl": sum(doc_lens) / len(doc_lens) if doc_lens else 0.0,
+        "terms": terms,
+    }, separators=(",", ":")).encode("utf-8")
+
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, INDEX_VERSION, len(header)))
+        f.write(header)
+        f.write(body)
+    os.replace(tmp_path, index_path)
+    return len(docs)
+
+
+class KnowledgeIndex:
+    """Read-only BM25 index over a memory-mapped postings file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, header_len = PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"{path} is not a version {INDEX_VERSION} knowledge index")
+
+        header = json.loads(self._mmap[PREAMBLE.size:PREAMBLE.size + header_len])
+        self._postings_start = PREAMBLE.size + header_len
+        self.docs = header["docs"]
+        self._doc_lens = header["doc_lens"]
+        self._avgdl = header["avgdl"] or 1.0
+        self._terms = header["terms"]
+        self._title_terms = [frozenset(doc.pop("title_terms")) for doc in self.docs]
+
+    def search(self, query: str, limit: int = 3) -> list[dict]:
+        """Top documents for query, best first, each with "score" and "match".
+
+        match is the Jaccard overlap of the query terms and the document's
+        title terms - 1.0 means the title names exactly this topic, no more
+        and no less ("Force" does not match "The Force (Star Wars)").
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        n_docs = len(self.docs)
+        scores = defaultdict(float)
+        for term in terms:
+            entry = self._terms.get(term)
+            if entry is None:
+                continue
+            offset, df = entry
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            start = self._postings_start + offset
+            for doc_id, tf in POSTING.iter_unpack(self._mmap[start:start + df * POSTING.size]):
+                norm = tf + K1 * (1 - B + B * self._doc_lens[doc_id] / self._avgdl)
+                scores[doc_id] += idf * tf * (K1 + 1) / norm
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [
+            {
+                **self.docs[doc_id],
+                "score": round(score, 3),
+                "match": len(terms & self._title_terms[doc_id]) / len(terms | self._title_terms[doc_id]),
+            }
+            for doc_id, score in ranked
+        ]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> KnowledgeIndex | None:
+    """The shared index, loaded on first use; None when no index file exists."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None and os.path.exists(INDEX_PATH):
+                _index = KnowledgeIndex(INDEX_PATH)
+    return _index
+
+
+def search(query: str, limit: int = 3) -> list[dict]:
+    """Search the local index; empty when there is no index."""
+    index = get_index()
+    return index.search(query, limit) if index else []
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "build":
+        count = build_index(sys.argv[2], sys.argv[3])
+        print(f"Indexed {count} documents into {sys.argv[3]}")
+    elif len(sys.argv) == 4 and sys.argv[1] == "query":
+        index = KnowledgeIndex(sys.argv[2])
+        started = time.perf_counter()
+        hits = index.search(sys.argv[3])
+        elapsed = (time.perf_counter() - started) * 1000
+        for hit in hits:
+            print(f"{hit['score']:7.3f}  {hit['match']:.2f}  {hit['title']}")
+        print(f"{len(hits)} hits in {elapsed:.3f} ms")
+    else:
+        sys.exit("usage: python -m src.knowledge build CORPUS INDEX | query INDEX QUERY")
@@ -0,0 +1,119 @@
+"""Output-length control: size LLM output from the target spoken duration."""
+
+import math
+import re
+import threading
+
+
+# Average speaking rate of the ElevenLabs voices at speed 1.0
+WORDS_PER_MINUTE = 150
+
+# Llama 3 tokenizer averages ~1.3 tokens per English word; round up for punctuation
+TOKENS_PER_WORD = 1.4
+
+# Extra room so the model can finish its last sentence past the word budget
+TOKEN_HEADROOM = 1.25
+
+# Target spoken durations (seconds) for the two prompt styles
+SHORT_EXPLANATION_SECONDS = 40  # run_agent: ~100 words at normal speed
+LONG_EXPLANATION_SECONDS = 75  # generate_explanation: ~150-200 words
+
+# A sentence end only counts once the following whitespace has arrived - a
+# streamed buffer ending in "3." or "Dr." may be mid-sentence
+SENTENCE_END = re.compile(r"[.!?…][\"')\]]*(?=\s)")
+
+# Words whose trailing period does not end a sentence
+ABBREVIATIONS = frozenset("dr mr mrs ms prof st vs e.g i.e approx".split())
+
+
+def word_budget(target_seconds: float, speed: float = 1.0) -> int:
+    """Words that fit in target_seconds of audio at the given voice speed."""
+    return max(20, int(target_seconds / 60 * WORDS_PER_MINUTE * speed))
+
+
+def max_tokens_for(words: int) -> int:
+    """max_tokens for an LLM call expected to produce about `words` words."""
+    return math.ceil(words * TOKENS_PER_WORD * TOKEN_HEADROOM)
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def estimate_tokens(text: str) -> int:
+    """Completion tokens for text, for when the API reports no usage."""
+    return math.ceil(count_words(text) * TOKENS_PER_WORD)
+
+
+def cut_at_sentence(text: str, words: int, final: bool = False) -> str | None:
+    """Return text cut at the first sentence end after `words` words, if any.
+
+    Pass final=True once the stream has finished, so a sentence end at the
+    very end of text counts too.
+    """
+    if count_words(text) < words:
+        return None
+    if final:
+        text += " "
+    for match in SENTENCE_END.finditer(text):
+        last_word = (text[:match.start()].split() or [""])[-1].lower()
+        if text[match.start()] == "." and last_word in ABBREVIATIONS:
+            continue
+        if count_words(text[:match.end()]) >= words:
+            return text[:match.end()]
+    return None
+
+
+class LengthStats:
+    """Thread-safe counters for length control, exposed via get_length_stats().
+
+    Early-stop figures are kept apart from max_tokens headroom: words_cut and
+    tokens_cut count only text that was streamed past the cut and thrown away.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.early_stops = 0
+        self.words_cut = 0
+        self.tokens_cut = 0
+        self.tokens_budgeted = 0
+        self.completion_tokens = 0
+        self.headroom_unused = 0
+
+    def record(self, max_tokens: int, completion_tokens: int, discarded: str | None = None) -> None:
+        """Count one call. completion_tokens is the API's figure or estimate_tokens().
+
+        discarded is the streamed text dropped by an early stop (None when the
+        model stopped on its own). headroom_unused is max_tokens minus what
+        was generated, for every call - budget slack, not a saving.
+        """
+        with self._lock:
+            self.calls += 1
+            self.tokens_budgeted += max_tokens
+            self.completion_tokens += completion_tokens
+            self.headroom_unused += max(0, max_tokens - completion_tokens)
+            if discarded is not None:
+                self.early_stops += 1
+                self.words_cut += count_words(discarded)
+                self.tokens_cut += estimate_tokens(discarded)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "early_stops": self.early_stops,
+                "words_cut": self.words_cut,
+                "tokens_cut": self.tokens_cut,
+                "tokens_budgeted": self.tokens_budgeted,
+                "completion_tokens": self.completion_tokens,
+                "headroom_unused": self.headroom_unused,
+            }
+
+
+LENGTH_STATS = LengthStats()
+
+
+def get_length_stats() -> dict:
+    """Return length-control metrics since process start."""
+    return LENGTH_STATS.snapshot()
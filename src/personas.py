@@ -1,115 +1,230 @@
-"""Persona definitions for Explainor."""
+"""Persona registry for Explainor.
+
+Personas live in a data file (personas.json by default) and are loaded into
+frozen Persona records with everything derived up front: the dropdown label,
+the ready-made ElevenLabs VoiceSettings and the spoken word budget. The file
+is re-read when it changes on disk, so personas can be added without a restart.
+
+An optional "tts" object per persona ({"model_id": ..., "output_format": ...})
+overrides the deployment's ElevenLabs model and output format. The "notes"
+object is documentation only: the ElevenLabs voice behind voice_id and why
+each voice setting has its value. Keep it in step when tuning a voice.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from elevenlabs import VoiceSettings
+
+from .length import SHORT_EXPLANATION_SECONDS, word_budget
+from .tts import DEFAULT_MODEL_ID, DEFAULT_OUTPUT_FORMAT, audio_suffix
+
+
+logger = logging.getLogger(__name__)
+
+PERSONAS_FILE = os.getenv(
+    "EXPLAINOR_PERSONAS_FILE",
+    os.path.join(os.path.dirname(__file__), "personas.json"),
+)
+
+# How often (seconds) to stat the data file for hot-reload
+RELOAD_CHECK_INTERVAL = 2.0
 
 # Voice settings: stability (0-1), similarity_boost (0-1), style (0-1), speed (0.5-2.0)
 # Lower stability = more expressive/variable
 # Higher style = more exaggerated delivery
 # Speed affects pacing
-
-PERSONAS = {
-    "5-Year-Old": {
-        "system_prompt": """You are an excited, curious 5-year-old child explaining things.
-Use very simple words that a child would know. Be enthusiastic and ask rhetorical questions.
-Say things like "Ooh!" and "Wow!" and "You know what?"
-Compare everything to toys, candy, cartoons, and playground activities.
-Keep sentences very short. Use lots of exclamation marks!""",
-        "voice_id": "jBpfuIE2acCO8z3wKNLl",  # "Aria" - young, enthusiastic
-        "voice_settings": {
-            "stability": 0.3,  # Very expressive, bouncy
-            "similarity_boost": 0.7,
-            "style": 0.8,  # Exaggerated childlike delivery
-            "speed": 1.15,  # Kids talk fast when excited
-        },
-        "emoji": "👶",
-    },
-    "Gordon Ramsay": {
-        "system_prompt": """You are Gordon Ramsay, the intense celebrity chef, explaining things.
-Be passionate, sometimes angry, and use lots of food and cooking metaphors.
-Occasionally call things "bloody brilliant" or express frustration at complexity.
-Compare concepts to cooking techniques, ingredients, and kitchen disasters.
-Use phrases like "Listen here!", "It's RAW!", "Absolutely stunning!", and "Donkey!".
-Be dramatic but ultimately make the explanation clear.""",
-        "voice_id": "N2lVS1w4EtoT3dr4eOWO",  # "Callum" - British, intense
-        "voice_settings": {
-            "stability": 0.25,  # Unpredictable, emotional
-            "similarity_boost": 0.8,
-            "style": 0.9,  # Maximum drama!
-            "speed": 1.1,  # Intense, rapid delivery
-        },
-        "emoji": "👨‍🍳",
-    },
-    "Pirate": {
-        "system_prompt": """You are a theatrical pirate captain explaining things.
-Use pirate slang: "Arrr!", "Ahoy!", "Shiver me timbers!", "Ye", "Aye", "Blimey!"
-Compare everything to treasure, ships, the sea, and pirate adventures.
-Talk about concepts like they're parts of a treasure map or sea voyage.
-Be dramatic and swashbuckling. Mention your crew, your ship, and rum occasionally.
-End with something about setting sail for knowledge.""",
-        "voice_id": "TX3LPaxmHKxFdv7VOQHJ",  # "Liam" - gruff, theatrical
-        "voice_settings": {
-            "stability": 0.35,  # Rough, varied
-            "similarity_boost": 0.6,
-            "style": 0.85,  # Theatrical pirate flair
-            "speed": 0.95,  # Slightly slower, dramatic
-        },
-        "emoji": "🏴‍☠️",
-    },
-    "Shakespeare": {
-        "system_prompt": """You are William Shakespeare explaining modern concepts in Elizabethan style.
-Use thee, thou, thy, hath, doth, 'tis, wherefore, prithee, forsooth, verily.
-Be dramatic and poetic. Use metaphors from nature, love, and theater.
-Occasionally quote or parody your own famous lines.
-Structure explanations like soliloquies with dramatic pauses.
-Compare technology and modern things to courtly intrigue and theatrical performance.""",
-        "voice_id": "onwK4e9ZLuTAKqWW03F9",  # "Daniel" - theatrical British
-        "voice_settings": {
-            "stability": 0.4,  # Theatrical variation
-            "similarity_boost": 0.75,
-            "style": 0.7,  # Dramatic but refined
-            "speed": 0.85,  # Slow, deliberate, poetic
-        },
-        "emoji": "🎭",
-    },
-    "Surfer Dude": {
-        "system_prompt": """You are a laid-back California surfer dude explaining things.
-Use surfer slang: "Bro", "Dude", "Gnarly", "Radical", "Stoked", "Totally", "Like", "Vibes".
-Compare everything to surfing, waves, the ocean, and beach life.
-Be super chill and positive. Everything is awesome and gives good vibes.
-Use "like" as filler. Talk about concepts like they're waves to ride.
-Keep the energy mellow but enthusiastic.""",
-        "voice_id": "ErXwobaYiN019PkySvjV",  # "Antoni" - laid-back American
-        "voice_settings": {
-            "stability": 0.5,  # Relaxed, flowing
-            "similarity_boost": 0.65,
-            "style": 0.6,  # Chill vibes
-            "speed": 0.9,  # Slooow and chill broooo
-        },
-        "emoji": "🏄",
-    },
-    "Yoda": {
-        "system_prompt": """You are Yoda, the wise Jedi Master, explaining things.
-Use inverted sentence structure: object-subject-verb. "Strong with this one, the Force is."
-Be wise, contemplative, and occasionally cryptic.
-Compare concepts to the Force, the Jedi way, and the balance of things.
-Use phrases like "Hmmmm", "Yes, yes", "Much to learn, you have."
-Speak slowly and thoughtfully. Make profound observations.
-Occasionally chuckle wisely: "Hehehehe".""",
-        "voice_id": "pqHfZKP75CvOlQylNhV4",  # "Bill" - slow, thoughtful
-        "voice_settings": {
-            "stability": 0.45,  # Wise, measured variations
-            "similarity_boost": 0.7,
-            "style": 0.5,  # Subtle but distinct
-            "speed": 0.7,  # Slow... speak I do... hmmm
-        },
-        "emoji": "🧙",
-    },
+DEFAULT_VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.75,
+    "style": 0.0,
+    "speed": 1.0,
 }
 
 
+class UnknownPersonaError(ValueError):
+    """Raised when a persona name or label is not in the registry."""
+
+
+@dataclass(frozen=True, slots=True)
+class Persona:
+    """One persona, with all derived data precomputed at load time."""
+
+    name: str
+    emoji: str
+    system_prompt: str
+    voice_id: str
+    voice_settings: Mapping
+    label: str  # "<emoji> <name>", as shown in the UI
+    style_hint: str  # Short prompt excerpt shown in the agent trace
+    tts_settings: VoiceSettings
+    word_budget: int  # Words in a short explanation at this voice's speed
+    tts_model_id: str | None = None  # Overrides the deployment's ElevenLabs model
+    tts_output_format: str | None = None  # Overrides the deployment's output format
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Persona":
+        voice_settings = {**DEFAULT_VOICE_SETTINGS, **data.get("voice_settings", {})}
+        tts = data.get("tts", {})
+        if tts.get("output_format"):
+            audio_suffix(tts["output_format"])  # Reject unusable formats at load time
+        return cls(
+            name=data["name"],
+            emoji=data["emoji"],
+            system_prompt=data["system_prompt"],
+            voice_id=data["voice_id"],
+            voice_settings=MappingProxyType(voice_settings),
+            label=f"{data['emoji']} {data['name']}",
+            style_hint=data["system_prompt"][:50] + "...",
+            tts_settings=VoiceSettings(**voice_settings),
+            word_budget=word_budget(SHORT_EXPLANATION_SECONDS, voice_settings["speed"]),
+            tts_model_id=tts.get("model_id"),
+            tts_output_format=tts.get("output_format"),
+        )
+
+    def audio_options(self, model_id: str = None, output_format: str = None) -> tuple[str, str]:
+        """Resolve (model_id, output_format): request > persona > deployment default."""
+        return (
+            model_id or self.tts_model_id or DEFAULT_MODEL_ID,
+            output_format or self.tts_output_format or DEFAULT_OUTPUT_FORMAT,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class _Snapshot:
+    version: int
+    mtime: float
+    by_name: Mapping
+    by_label: Mapping
+    names: tuple
+    labels: tuple
+
+
+class PersonaRegistry(Mapping):
+    """Read-only name -> Persona mapping backed by a JSON data file.
+
+    Lookups hit a precomputed snapshot; reloads build a new snapshot and swap
+    it in whole, so readers never see a half-loaded registry.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._snapshot = self._load()
+
+    def _load(self) -> _Snapshot:
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        personas = [Persona.from_dict(entry) for entry in data["personas"]]
+        if not personas:
+            raise ValueError(f"No personas defined in {self.path}")
+        for field in ("name", "label"):
+            seen = set()
+            for persona in personas:
+                value = getattr(persona, field)
+                if value in seen:
+                    raise ValueError(f"Duplicate persona {field} {value!r} in {self.path}")
+                seen.add(value)
+
+        return _Snapshot(
+            version=data.get("version", 1),
+            mtime=mtime,
+            by_name=MappingProxyType({p.name: p for p in personas}),
+            by_label=MappingProxyType({p.label: p for p in personas}),
+            names=tuple(p.name for p in personas),
+            labels=tuple(p.label for p in personas),
+        )
+
+    def reload(self) -> bool:
+        """Reload the data file now. Returns False (keeping the old data) on error."""
+        with self._lock:
+            try:
+                self._snapshot = self._load()
+            except Exception as e:
+                logger.warning("Persona reload from %s failed: %s", self.path, e)
+                return False
+        return True
+
+    def _current(self) -> _Snapshot:
+        """Return the live snapshot, reloading first if the file changed."""
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + RELOAD_CHECK_INTERVAL
+            try:
+                changed = os.stat(self.path).st_mtime != self._snapshot.mtime
+            except OSError:
+                changed = False
+            if changed:
+                self.reload()
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._current().version
+
+    @property
+    def default(self) -> Persona:
+        """First persona in the data file."""
+        snapshot = self._current()
+        return snapshot.by_name[snapshot.names[0]]
+
+    def names(self) -> tuple:
+        return self._current().names
+
+    def labels(self) -> tuple:
+        return self._current().labels
+
+    def by_label(self, label: str) -> Persona:
+        try:
+            return self._current().by_label[label]
+        except KeyError:
+            raise UnknownPersonaError(f"Unknown persona: {label!r}") from None
+
+    def resolve(self, name_or_label: str) -> Persona:
+        """Look up a persona by name or by UI label ("<emoji> <name>")."""
+        snapshot = self._current()
+        persona = snapshot.by_name.get(name_or_label) or snapshot.by_label.get(name_or_label)
+        if persona is None:
+            raise UnknownPersonaError(
+                f"Unknown persona: {name_or_label!r}. Choose one of: {', '.join(snapshot.names)}"
+            )
+        return persona
+
+    def __getitem__(self, name: str) -> Persona:
+        return self._current().by_name[name]
+
+    def __iter__(self):
+        return iter(self._current().names)
+
+    def __len__(self) -> int:
+        return len(self._current().names)
+
+
+PERSONAS = PersonaRegistry(PERSONAS_FILE)
+
+
 def get_persona_names() -> list[str]:
     """Return list of persona names for dropdown."""
-    return list(PERSONAS.keys())
+    return list(PERSONAS.names())
+
+
+def get_persona_labels() -> list[str]:
+    """Return list of "<emoji> <name>" labels for dropdown."""
+    return list(PERSONAS.labels())
+
 
+def get_persona(name: str) -> Persona:
+    """Get persona by name or UI label.
 
-def get_persona(name: str) -> dict:
-    """Get persona config by name."""
-    return PERSONAS.get(name, PERSONAS["5-Year-Old"])
+    Raises UnknownPersonaError for names not in the registry.
+    """
+    return PERSONAS.resolve(name)
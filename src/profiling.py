@@ -0,0 +1,275 @@
+"""Opt-in sampling profiler producing collapsed stacks for flamegraphs.
+
+Enable with EXPLAINOR_PROFILE:
+
+    all     - profile every request
+    header  - profile only requests sent with "X-Explainor-Profile: <token>"
+
+where <token> is the secret in EXPLAINOR_PROFILE_TOKEN. The same header is
+required by the /debug/profile endpoints, which are not mounted at all
+without a token, so anonymous clients can neither switch on sampling nor
+read profiles.
+
+A single daemon thread samples the stacks of threads currently serving a
+profiled request every EXPLAINOR_PROFILE_INTERVAL_MS (default 5ms), so
+unprofiled requests pay nothing and profiled ones pay only the sampling.
+Output is in the collapsed format ("frame;frame;frame count") read by
+flamegraph.pl, speedscope and inferno, per request or per time window. With
+EXPLAINOR_PROFILE_DIR set, each request's profile is also written there as
+<id>-<label>.collapsed.
+"""
+
+import contextvars
+import hmac
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from functools import wraps
+
+
+PROFILE_MODE = os.getenv("EXPLAINOR_PROFILE", "").lower()
+if PROFILE_MODE in ("1", "true", "yes"):
+    PROFILE_MODE = "all"
+
+PROFILE_HEADER = "x-explainor-profile"
+PROFILE_TOKEN = os.getenv("EXPLAINOR_PROFILE_TOKEN", "")
+SAMPLE_INTERVAL = float(os.getenv("EXPLAINOR_PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_DIR = os.getenv("EXPLAINOR_PROFILE_DIR", "")
+
+# Finished request profiles kept for /debug/profile?request=<id>
+MAX_SESSIONS = 100
+
+# Seconds of per-second aggregates kept for /debug/profile?window=<seconds>
+MAX_WINDOW = 600
+
+# Frames from these files are noise in a flamegraph (the sampler itself)
+_SKIP_FILES = (__file__,)
+
+
+def enabled() -> bool:
+    return PROFILE_MODE in ("all", "header")
+
+
+def authorized(headers: dict | None = None) -> bool:
+    """Whether the request carries the profiling token in X-Explainor-Profile."""
+    if not PROFILE_TOKEN or not headers:
+        return False
+    return hmac.compare_digest(str(headers.get(PROFILE_HEADER, "")).encode(), PROFILE_TOKEN.encode())
+
+
+def should_profile(headers: dict | None = None) -> bool:
+    """Whether a request with these headers should be profiled."""
+    if PROFILE_MODE == "all":
+        return True
+    if PROFILE_MODE == "header":
+        return authorized(headers)
+    return False
+
+
+class ProfileSession:
+    """Samples collected for one request."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, label: str):
+        self.id = next(self._ids)
+        self.label = label
+        self.started = time.time()
+        self.duration = 0.0
+        self.samples = Counter()
+
+
+class SamplingProfiler:
+    """Background sampler of the threads registered for profiling."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._active: dict[int, list[ProfileSession]] = {}
+        self._sessions: deque[ProfileSession] = deque(maxlen=MAX_SESSIONS)
+        self._window: deque[tuple[int, Counter]] = deque()
+        self._thread = None
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="explainor-profiler", daemon=True)
+            self._thread.start()
+
+    def attach(self, session: ProfileSession) -> None:
+        """Start sampling the calling thread into session."""
+        with self._lock:
+            self._ensure_started()
+            self._active.setdefault(threading.get_ident(), []).append(session)
+
+    def detach(self, session: ProfileSession) -> None:
+        """Stop sampling the calling thread into session."""
+        thread_id = threading.get_ident()
+        with self._lock:
+            sessions = self._active.get(thread_id, [])
+            if session in sessions:
+                sessions.remove(session)
+            if not sessions:
+                self._active.pop(thread_id, None)
+
+    def finish(self, session: ProfileSession) -> None:
+        session.duration = time.time() - session.started
+        with self._lock:
+            self._sessions.append(session)
+            output = format_collapsed(session.samples) if PROFILE_DIR else ""
+
+        if PROFILE_DIR:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, f"{session.id:06d}-{session.label}.collapsed")
+            with open(path, "w") as f:
+                f.write(output)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                active = {tid: list(sessions) for tid, sessions in self._active.items()}
+
+            frames = sys._current_frames()
+            second = int(time.time())
+            with self._lock:
+                if not self._window or self._window[-1][0] != second:
+                    self._window.append((second, Counter()))
+                    while self._window and self._window[0][0] < second - MAX_WINDOW:
+                        self._window.popleft()
+                bucket = self._window[-1][1]
+
+                for thread_id, sessions in active.items():
+                    frame = frames.get(thread_id)
+                    if frame is None:
+                        continue
+                    stack = collapse(frame)
+                    bucket[stack] += 1
+                    for session in sessions:
+                        session.samples[stack] += 1
+
+    def sessions(self) -> list[dict]:
+        with self._lock:
+            return [
+                {
+                    "id": s.id,
+                    "label": s.label,
+                    "started": s.started,
+                    "duration": round(s.duration, 3),
+                    "samples": sum(s.samples.values()),
+                }
+                for s in self._sessions
+            ]
+
+    def request_profile(self, session_id: int) -> str | None:
+        with self._lock:
+            for session in self._sessions:
+                if session.id == session_id:
+                    return format_collapsed(session.samples)
+        return None
+
+    def window_profile(self, seconds: int) -> str:
+        cutoff = int(time.time()) - seconds
+        merged = Counter()
+        with self._lock:
+            for second, counts in self._window:
+                if second >= cutoff:
+                    merged.update(counts)
+        return format_collapsed(merged)
+
+
+def collapse(frame) -> str:
+    """Render a frame's stack root-first as "module:function;...;module:function"."""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename not in _SKIP_FILES:
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            parts.append(f"{module}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+def format_collapsed(samples: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+PROFILER = SamplingProfiler()
+
+_current_session: contextvars.ContextVar[ProfileSession | None] = contextvars.ContextVar(
+    "explainor_profile_session", default=None
+)
+
+
+@contextmanager
+def profile(label: str, active: bool = True):
+    """Sample the calling thread for the duration of the block.
+
+    Yields the ProfileSession, or None when profiling is off.
+    """
+    if not active:
+        yield None
+        return
+
+    session = ProfileSession(label)
+    token = _current_session.set(session)
+    PROFILER.attach(session)
+    try:
+        yield session
+    finally:
+        PROFILER.detach(session)
+        _current_session.reset(token)
+        PROFILER.finish(session)
+
+
+def profile_generator(gen, label: str, active: bool = True):
+    """Profile a generator handler across all of its steps.
+
+    Gradio may resume a sync generator on a different worker thread for each
+    step, so the current thread is attached around every next() call.
+    """
+    if not active:
+        yield from gen
+        return
+
+    session = ProfileSession(label)
+    try:
+        while True:
+            token = _current_session.set(session)
+            PROFILER.attach(session)
+            try:
+                item = next(gen)
+            except StopIteration:
+                return
+            finally:
+                PROFILER.detach(session)
+                _current_session.reset(token)
+            yield item
+    finally:
+        gen.close()
+        PROFILER.finish(session)
+
+
+def propagate(fn):
+    """Wrap fn so a worker thread running it is sampled into the caller's profile.
+
+    Use when handing work to a thread pool from inside a profiled request.
+    """
+    session = _current_session.get()
+    if session is None:
+        return fn
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        PROFILER.attach(session)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            PROFILER.detach(session)
+
+    return wrapper
@@ -1,33 +1,132 @@
 """ElevenLabs Text-to-Speech integration."""
 
+import io
 import os
+import math
+import time
+import wave
+import httpx
 from elevenlabs import ElevenLabs, VoiceSettings
 
+from . import cassette, usage
+from .deadline import Deadline, DeadlineExceeded
+
+
+# Timeout cap for one synthesis (the request deadline may shorten it)
+TTS_TIMEOUT = 60.0
+
+# Deployment defaults; personas and individual requests may override them
+DEFAULT_MODEL_ID = os.getenv("ELEVENLABS_MODEL_ID", "eleven_multilingual_v2")
+DEFAULT_OUTPUT_FORMAT = os.getenv("ELEVENLABS_OUTPUT_FORMAT", "mp3_44100_128")
+
+# Codec prefix of an ElevenLabs output_format -> file suffix of what we deliver.
+# Raw PCM is wrapped in a WAV header (no transcoding) so browsers can play it.
+AUDIO_SUFFIXES = {
+    "mp3": ".mp3",
+    "opus": ".opus",
+    "wav": ".wav",
+    "pcm": ".wav",
+}
+
+# Quality/latency presets offered in the UI and the MCP tool: (model_id, output_format).
+# None falls back to the persona's setting, then to the deployment default.
+AUDIO_PRESETS = {
+    "⚙️ Default": (None, None),
+    "🎧 Standard": ("eleven_multilingual_v2", "mp3_44100_128"),
+    "⚡ Fast": ("eleven_turbo_v2_5", "mp3_22050_32"),
+    "📱 Mobile": ("eleven_flash_v2_5", "opus_48000_32"),
+    "🔉 Uncompressed": ("eleven_flash_v2_5", "pcm_22050"),
+}
+
+
+def audio_suffix(output_format: str) -> str:
+    """File suffix for audio produced with the given output_format."""
+    codec = output_format.split("_", 1)[0]
+    if codec not in AUDIO_SUFFIXES:
+        raise ValueError(
+            f"Unsupported output format: {output_format!r}. "
+            f"Use one of the {', '.join(AUDIO_SUFFIXES)} formats."
+        )
+    return AUDIO_SUFFIXES[codec]
+
+
+def resolve_audio_preset(preset: str) -> tuple[str | None, str | None]:
+    """Map a preset name (or a raw output_format) to (model_id, output_format).
+
+    An empty preset means "use the persona/deployment defaults".
+    """
+    if not preset:
+        return None, None
+    if preset in AUDIO_PRESETS:
+        return AUDIO_PRESETS[preset]
+    for label, options in AUDIO_PRESETS.items():
+        if label.split(" ", 1)[-1].lower() == preset.lower():
+            return options
+    audio_suffix(preset)  # Raises for anything that is not a usable output_format
+    return None, preset
+
+
+def pcm_to_wav(pcm: bytes, output_format: str) -> bytes:
+    """Wrap 16-bit mono PCM from ElevenLabs (e.g. "pcm_22050") in a WAV header."""
+    sample_rate = int(output_format.split("_")[1])
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
 
 def get_client() -> ElevenLabs:
     """Get configured ElevenLabs client."""
     api_key = os.getenv("ELEVENLABS_API_KEY")
+    if not api_key and cassette.replaying():
+        api_key = "replay"
     if not api_key:
         raise ValueError("ELEVENLABS_API_KEY environment variable not set")
+
+    transport = cassette.get_transport()
+    if transport is not None:
+        return ElevenLabs(api_key=api_key, httpx_client=httpx.Client(transport=transport))
     return ElevenLabs(api_key=api_key)
 
 
-def generate_speech(text: str, voice_id: str, voice_settings: dict = None) -> bytes:
+def generate_speech(
+    text: str,
+    voice_id: str,
+    voice_settings: dict | VoiceSettings = None,
+    deadline: Deadline = None,
+    model_id: str = None,
+    output_format: str = None,
+) -> bytes:
     """Generate speech audio from text.
 
     Args:
         text: The text to convert to speech
         voice_id: ElevenLabs voice ID
-        voice_settings: Optional dict with stability, similarity_boost, style, speed
+        voice_settings: Optional VoiceSettings (e.g. Persona.tts_settings) or a dict
+            with stability, similarity_boost, style, speed
+        deadline: Optional request deadline; the stream is abandoned when it expires
+        model_id: ElevenLabs model (default: ELEVENLABS_MODEL_ID or eleven_multilingual_v2)
+        output_format: ElevenLabs output format (default: ELEVENLABS_OUTPUT_FORMAT
+            or mp3_44100_128); see audio_suffix() for the file type delivered
 
     Returns:
-        Audio bytes (MP3 format)
+        Audio bytes in the container matching audio_suffix(output_format)
     """
+    model_id = model_id or DEFAULT_MODEL_ID
+    output_format = output_format or DEFAULT_OUTPUT_FORMAT
+    audio_suffix(output_format)
+
     client = get_client()
+    timeout = deadline.timeout(TTS_TIMEOUT) if deadline else TTS_TIMEOUT
 
     # Build voice settings if provided
     settings = None
-    if voice_settings:
+    if isinstance(voice_settings, VoiceSettings):
+        settings = voice_settings
+    elif voice_settings:
         settings = VoiceSettings(
             stability=voice_settings.get("stability", 0.5),
             similarity_boost=voice_settings.get("similarity_boost", 0.75),
@@ -39,34 +138,49 @@ def generate_speech(text: str, voice_id: str, voice_settings: dict = None) -> by
     kwargs = {
         "voice_id": voice_id,
         "text": text,
-        "model_id": "eleven_multilingual_v2",
-        "output_format": "mp3_44100_128",
+        "model_id": model_id,
+        "output_format": output_format,
+        "request_options": {"timeout_in_seconds": math.ceil(timeout)},
     }
     if settings:
         kwargs["voice_settings"] = settings
 
+    started = time.perf_counter()
     audio_generator = client.text_to_speech.convert(**kwargs)
 
-    # Collect all audio chunks
+    # Collect all audio chunks, closing the stream if the deadline passes
     audio_chunks = []
-    for chunk in audio_generator:
-        audio_chunks.append(chunk)
-
-    return b"".join(audio_chunks)
-
-
-def generate_speech_file(text: str, voice_id: str, output_path: str) -> str:
+    try:
+        for chunk in audio_generator:
+            if deadline:
+                deadline.check()
+            audio_chunks.append(chunk)
+    except DeadlineExceeded:
+        audio_generator.close()
+        raise
+    finally:
+        # ElevenLabs bills the characters sent, even for an abandoned stream
+        usage.record(tts_characters=len(text), tts_seconds=time.perf_counter() - started)
+
+    audio_bytes = b"".join(audio_chunks)
+    if output_format.startswith("pcm_"):
+        audio_bytes = pcm_to_wav(audio_bytes, output_format)
+    return audio_bytes
+
+
+def generate_speech_file(text: str, voice_id: str, output_path: str, output_format: str = None) -> str:
     """Generate speech and save to file.
 
     Args:
         text: The text to convert to speech
         voice_id: ElevenLabs voice ID
         output_path: Path to save the audio file
+        output_format: Optional ElevenLabs output format (see generate_speech)
 
     Returns:
         Path to the saved audio file
     """
-    audio_bytes = generate_speech(text, voice_id)
+    audio_bytes = generate_speech(text, voice_id, output_format=output_format)
 
     with open(output_path, "wb") as f:
         f.write(audio_bytes)
@@ -0,0 +1,350 @@
+"""Usage and cost accounting per request, persona, audience and client.
+
+Each UI/MCP request opens a UsageRecord (via track() or track_generator());
+the upstream calls made while serving it add to that record through a
+context variable, so no accounting state is threaded through the agent:
+
+    call_llm()         prompt/completion tokens, LLM latency and early stops
+    web_search()       search latency
+    generate_speech()  TTS characters and latency
+    research_topic()   local knowledge hits that saved a web round-trip
+
+Compare requests are split: each persona gets a child record (see child()
+and bind()) for its own LLM and TTS calls, and the request's own record
+keeps the shared research with an empty persona, so grouping by persona
+neither merges personas nor double counts. Child rows add to the counters
+but not to the request count or duration.
+
+Finished records go into a fixed-size ring buffer that a background thread
+flushes to SQLite (EXPLAINOR_USAGE_DB) every EXPLAINOR_USAGE_FLUSH_SECONDS.
+summarize() aggregates them by any mix of persona, audience, client and kind:
+
+    python -m src.usage persona client
+"""
+
+import atexit
+import contextvars
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+
+
+USAGE_DB = os.getenv("EXPLAINOR_USAGE_DB", "usage.sqlite3")
+FLUSH_INTERVAL = float(os.getenv("EXPLAINOR_USAGE_FLUSH_SECONDS", "60"))
+
+# Finished records held in memory between flushes (oldest dropped when full)
+RING_SIZE = 2048
+
+GROUP_COLUMNS = ("persona", "audience", "client", "kind")
+
+
+@dataclass(slots=True)
+class UsageRecord:
+    """Counters for one request. Updated from several threads, hence the lock."""
+
+    kind: str
+    persona: str = ""
+    audience: str = ""
+    client: str = "unknown"
+    started: float = field(default_factory=time.time)
+    duration: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    tts_characters: int = 0
+    cache_hits: int = 0
+    search_seconds: float = 0.0
+    llm_seconds: float = 0.0
+    tts_seconds: float = 0.0
+    early_stops: int = 0  # LLM streams cut at a sentence end past the word budget
+    tokens_cut: int = 0  # Estimated tokens streamed past those cuts and discarded
+    top_level: bool = True  # False for a persona's share of a compare (see child())
+    seq: int = 0
+    children: list = field(default_factory=list, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, **counts) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+
+_COLUMNS = (
+    "kind", "persona", "audience", "client", "started", "duration",
+    "prompt_tokens", "completion_tokens", "tts_characters", "cache_hits",
+    "search_seconds", "llm_seconds", "tts_seconds", "early_stops", "tokens_cut",
+    "top_level",
+)
+
+# Columns added after the first release of the table, for older stores
+_ADDED_COLUMNS = (("early_stops", "INTEGER", 0), ("tokens_cut", "INTEGER", 0), ("top_level", "INTEGER", 1))
+
+# Counters summed over every row, child rows included
+_SUMS = _COLUMNS[6:-1]
+
+
+class UsageLedger:
+    """Ring buffer of finished records with periodic flush to SQLite."""
+
+    def __init__(self, db_path: str = USAGE_DB, flush_interval: float = FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self._ring: deque[UsageRecord] = deque(maxlen=RING_SIZE)
+        self._seq = itertools.count(1)
+        self._flushed_seq = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_flusher(self) -> None:
+        if self._thread is None and self.db_path:
+            self._thread = threading.Thread(target=self._run, name="explainor-usage", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass  # Keep the records in the ring and retry next interval
+
+    def append(self, record: UsageRecord) -> None:
+        with self._lock:
+            self._ensure_flusher()
+            record.seq = next(self._seq)
+            if len(self._ring) == self._ring.maxlen and self._ring[0].seq > self._flushed_seq:
+                self.dropped += 1
+            self._ring.append(record)
+
+    def recent(self) -> list[UsageRecord]:
+        with self._lock:
+            return list(self._ring)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS usage ("
+            "kind TEXT, persona TEXT, audience TEXT, client TEXT, started REAL, duration REAL, "
+            "prompt_tokens INTEGER, completion_tokens INTEGER, tts_characters INTEGER, "
+            "cache_hits INTEGER, search_seconds REAL, llm_seconds REAL, tts_seconds REAL, "
+            "early_stops INTEGER, tokens_cut INTEGER, top_level INTEGER)"
+        )
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(usage)")}
+        for column, kind, default in _ADDED_COLUMNS:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE usage ADD COLUMN {column} {kind} NOT NULL DEFAULT {default}")
+        return conn
+
+    def flush(self) -> int:
+        """Write records added since the last flush to SQLite. Returns how many."""
+        if not self.db_path:
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                pending = [r for r in self._ring if r.seq > self._flushed_seq]
+            if not pending:
+                return 0
+
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany(
+                        f"INSERT INTO usage ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                        [tuple(getattr(r, c) for c in _COLUMNS) for r in pending],
+                    )
+            finally:
+                conn.close()
+
+            with self._lock:
+                self._flushed_seq = pending[-1].seq
+            return len(pending)
+
+    def summarize(self, group_by: tuple[str, ...] = ("persona",), since: float = 0.0) -> list[dict]:
+        """Totals per group, most LLM tokens first.
+
+        requests and duration count top-level records only; the counters
+        include compare child records. Reads the SQLite store (after
+        flushing) or, without one, the ring buffer.
+        """
+        unknown = set(group_by) - set(GROUP_COLUMNS)
+        if unknown:
+            raise ValueError(f"Cannot group usage by {', '.join(sorted(unknown))}")
+
+        if self.db_path:
+            self.flush()
+            conn = self._connect()
+            try:
+                keys = ", ".join(group_by) or "'all'"
+                sums = ", ".join(f"SUM({c})" for c in _SUMS)
+                rows = conn.execute(
+                    f"SELECT {keys}, SUM(top_level), SUM(duration * top_level), {sums} "
+                    f"FROM usage WHERE started >= ? GROUP BY {keys}",
+                    (since,),
+                ).fetchall()
+            finally:
+                conn.close()
+            width = max(len(group_by), 1)
+            groups = [
+                {
+                    **dict(zip(group_by, row[:width])),
+                    "requests": row[width],
+                    "duration": row[width + 1],
+                    **dict(zip(_SUMS, row[width + 2:])),
+                }
+                for row in rows
+            ]
+        else:
+            totals = {}
+            for record in self.recent():
+                if record.started < since:
+                    continue
+                key = tuple(getattr(record, c) for c in group_by)
+                group = totals.setdefault(
+                    key, {**dict(zip(group_by, key)), "requests": 0, "duration": 0.0, **{c: 0 for c in _SUMS}}
+                )
+                if record.top_level:
+                    group["requests"] += 1
+                    group["duration"] += record.duration
+                for c in _SUMS:
+                    group[c] += getattr(record, c)
+            groups = list(totals.values())
+
+        return sorted(groups, key=lambda g: g["prompt_tokens"] + g["completion_tokens"], reverse=True)
+
+
+LEDGER = UsageLedger()
+
+_current: contextvars.ContextVar[UsageRecord | None] = contextvars.ContextVar("explainor_usage", default=None)
+
+
+def record(**counts) -> None:
+    """Add counts to the current request's record (no-op outside a tracked request)."""
+    current = _current.get()
+    if current is not None:
+        current.add(**counts)
+
+
+def detect_client(headers=None, path: str = "") -> str:
+    """"mcp" for calls through Gradio's MCP server, "ui" for everything else.
+
+    Gradio's MCP server forwards tool calls through its own client to
+    /gradio_api/queue/join with "x-gradio-user: mcp"; that header is the
+    reliable signal. The path and mcp-* headers only catch direct MCP routes.
+    """
+    names = {str(name).lower(): value for name, value in headers.items()} if headers else {}
+    if str(names.get("x-gradio-user", "")).lower() == "mcp":
+        return "mcp"
+    if "/mcp" in path or any(name.startswith("mcp-") for name in names):
+        return "mcp"
+    return "ui" if headers else "unknown"
+
+
+def child(persona: str) -> UsageRecord | None:
+    """A record for one persona's share of the current request.
+
+    It inherits kind, audience and client and is written out together with
+    the parent. None outside a tracked request.
+    """
+    parent = _current.get()
+    if parent is None:
+        return None
+    usage_record = UsageRecord(
+        kind=parent.kind,
+        persona=persona,
+        audience=parent.audience,
+        client=parent.client,
+        started=parent.started,
+        top_level=False,
+    )
+    with parent._lock:
+        parent.children.append(usage_record)
+    return usage_record
+
+
+def bind(fn, usage_record: UsageRecord | None):
+    """Wrap fn so the upstream calls it makes are accounted to usage_record.
+
+    Use when handing one persona's work to a thread pool.
+    """
+    if usage_record is None:
+        return fn
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _current.set(usage_record)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+    return wrapper
+
+
+def _finish(usage_record: UsageRecord) -> None:
+    usage_record.duration = time.time() - usage_record.started
+    LEDGER.append(usage_record)
+    for child_record in usage_record.children:
+        child_record.duration = usage_record.duration
+        LEDGER.append(child_record)
+
+
+@contextmanager
+def track(kind: str, persona: str = "", audience: str = "", client: str = "unknown"):
+    """Account every upstream call made inside the block to one UsageRecord."""
+    usage_record = UsageRecord(kind=kind, persona=persona, audience=audience, client=client)
+    token = _current.set(usage_record)
+    try:
+        yield usage_record
+    finally:
+        _current.reset(token)
+        _finish(usage_record)
+
+
+def track_generator(gen, kind: str, persona: str = "", audience: str = "", client: str = "unknown"):
+    """track() for generator handlers, re-entered around every step.
+
+    Gradio may resume a sync generator on a different worker thread (and
+    context) for each step, so the record is set around every next() call.
+    """
+    usage_record = UsageRecord(kind=kind, persona=persona, audience=audience, client=client)
+    try:
+        while True:
+            token = _current.set(usage_record)
+            try:
+                item = next(gen)
+            except StopIteration:
+                return
+            finally:
+                _current.reset(token)
+            yield item
+    finally:
+        gen.close()
+        _finish(usage_record)
+
+
+def summarize(group_by: tuple[str, ...] = ("persona",), since: float = 0.0) -> list[dict]:
+    """Usage totals grouped by any of persona, audience, client and kind."""
+    return LEDGER.summarize(group_by, since)
+
+
+if __name__ == "__main__":
+    import sys
+
+    group_by = tuple(sys.argv[1:]) or ("persona",)
+    for group in summarize(group_by):
+        keys = "  ".join(f"{c}={group[c]!s}" for c in group_by)
+        print(
+            f"{keys}  requests={group['requests']}  "
+            f"tokens={group['prompt_tokens']}+{group['completion_tokens']}  "
+            f"tts_chars={group['tts_characters']}  cache_hits={group['cache_hits']}  "
+            f"early_stops={group['early_stops']} (-{group['tokens_cut']} tokens)  "
+            f"search={group['search_seconds']:.1f}s llm={group['llm_seconds']:.1f}s tts={group['tts_seconds']:.1f}s"
+        )